@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 # ui_extensions.py - Extensions to the quiet_interface.py UI for RAG support
 
+import functools
 import os
 from pathlib import Path
 
@@ -1460,11 +1461,13 @@ def get_rag_ui_extensions():
 
 
 # Function to get HTML with RAG extensions
+@functools.lru_cache(maxsize=None)
 def get_extended_html_template():
     """Get the HTML template with RAG extensions
 
     This function modifies the original HTML template to add RAG support
-    without duplicating the entire interface
+    without duplicating the entire interface. The result only depends on
+    module constants, so it is built once and cached.
     """
     from scripts.quiet_interface import HTML_TEMPLATE
 
@@ -6,10 +6,13 @@ Handles project organization, documents, chats, and artifacts for the RAG system
 """
 
 import os
+import copy
 import json
 import shutil
+import threading
 import uuid
 import time
+from collections import OrderedDict
 from pathlib import Path
 from datetime import datetime
 from typing import List, Dict, Any, Optional, Union, Set
@@ -27,6 +30,9 @@ from rag.search import SearchEngine
 # Get logger for this module
 logger = get_logger("rag_support.project_manager")
 
+# Maximum number of parsed documents kept in the document cache
+DOCUMENT_CACHE_SIZE = 512
+
 # Import BASE_DIR from rag_support
 try:
     from rag_support import BASE_DIR
@@ -68,6 +74,11 @@ class ProjectManager:
         # Document collections for each project (project_id -> DocumentCollection)
         self.document_collections = {}
 
+        # Parsed documents, least recently used first
+        # (file path -> (mtime_ns, size, document dictionary))
+        self.document_cache = OrderedDict()
+        self.document_cache_lock = threading.Lock()
+
         logger.info(f"Project manager initialized with projects directory: {self.projects_dir}")
 
     def get_storage(self, project_id: str) -> FileSystemStorage:
@@ -251,6 +262,40 @@ class ProjectManager:
 
         return projects
 
+    def first_project_id(self) -> Optional[str]:
+        """
+        Get the ID of the most recently updated project.
+
+        This is the first project get_projects returns. The cached project
+        list is used when it is fresh; otherwise only the project.json files
+        are read, without the document counting get_projects may do.
+
+        Returns:
+            Project ID if any project exists, None otherwise
+        """
+        if self.projects_cache is not None and time.time() - self.last_cache_update < 30:
+            return self.projects_cache[0]["id"] if self.projects_cache else None
+
+        newest = None
+        try:
+            for project_dir in self.projects_dir.glob("*"):
+                project_file = project_dir / "project.json"
+                if project_dir.name.startswith(".") or not project_file.is_file():
+                    continue
+                try:
+                    with open(project_file, "r") as f:
+                        project_data = json.load(f)
+                except Exception as e:
+                    logger.error(f"Error reading project {project_dir.name}: {e}")
+                    continue
+                # Same order as get_projects: the first of the most recent wins
+                if newest is None or project_data.get("updated_at", "") > newest.get("updated_at", ""):
+                    newest = project_data
+        except OSError as e:
+            logger.error(f"Error scanning projects directory: {e}")
+
+        return newest.get("id") if newest else None
+
     def get_project(self, project_id: str) -> Optional[Dict[str, Any]]:
         """
         Get a specific project by ID.
@@ -401,6 +446,74 @@ class ProjectManager:
         """
         Get a document by ID.
 
+        Parsed documents are cached by file modification time and size, so
+        documents referenced again on later chat turns are not re-read until
+        they change. The size also catches edits within the mtime resolution
+        of coarse filesystems.
+
+        Args:
+            project_id: ID of the project
+            doc_id: ID of the document
+
+        Returns:
+            Document dictionary if found, None otherwise
+        """
+        try:
+            file_path = self.get_storage(project_id).directory / f"{doc_id}.md"
+            stat = file_path.stat()
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.error(f"Error getting document {doc_id} from project {project_id}: {e}")
+            return None
+
+        with self.document_cache_lock:
+            cached = self.document_cache.get(file_path)
+            if cached and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+                self.document_cache.move_to_end(file_path)
+                result = cached[2]
+            else:
+                result = None
+
+        if result is None:
+            result = self._load_document(project_id, doc_id)
+            # Failed loads are not cached, so a transient error is retried
+            if result is None:
+                return None
+            with self.document_cache_lock:
+                self.document_cache[file_path] = (stat.st_mtime_ns, stat.st_size, result)
+                self.document_cache.move_to_end(file_path)
+                if len(self.document_cache) > DOCUMENT_CACHE_SIZE:
+                    self.document_cache.popitem(last=False)
+
+        # Deep copy so callers cannot modify the cached document, including
+        # its nested metadata and tags
+        return copy.deepcopy(result)
+
+    def get_document_size(self, project_id: str, doc_id: str) -> Optional[int]:
+        """
+        Get the size of a document file without loading it.
+
+        The size includes the frontmatter, so it only approximates the
+        length of the document's content.
+
+        Args:
+            project_id: ID of the project
+            doc_id: ID of the document
+
+        Returns:
+            File size in bytes if the document exists, None otherwise
+        """
+        try:
+            file_path = self.get_storage(project_id).directory / f"{doc_id}.md"
+            return file_path.stat().st_size
+        except OSError:
+            return None
+
+    def _load_document(self, project_id: str, doc_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Load a document dictionary from storage.
+
         Args:
             project_id: ID of the project
             doc_id: ID of the document
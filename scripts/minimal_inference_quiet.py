@@ -1,10 +1,35 @@
 #!/usr/bin/env python3
 # minimal_inference_quiet.py - Simple inference wrapper for LLMs with minimized debug output
 
+import argparse
+import asyncio
+import contextlib
+import functools
+import gc
+import json
 import os
+import sys
+import threading
 import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+# Use orjson for the JSON-lines server when available - it parses and emits
+# bytes directly. Its JSONDecodeError is a ValueError like the json module's.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if orjson:
+    _json_dumps = orjson.dumps
+    _json_loads = orjson.loads
+else:
+    def _json_dumps(data):
+        return json.dumps(data).encode('utf-8')
+    _json_loads = json.loads
+
 # Suppress llama.cpp debug logs
 os.environ["LLAMA_CPP_VERBOSE"] = "0"
 
@@ -14,11 +39,106 @@ BASE_DIR = Path("/Volumes/LLM")
 # Global variable to store model instances
 loaded_models = {}
 
+# Common stop sequences for llama.cpp completions
+STOP_SEQUENCES = ["</s>", "[/INST]", "### User:"]
+
+# File extensions recognized as model weights
+_MODEL_SUFFIXES = frozenset({'.bin', '.gguf', '.safetensors'})
+
+def _subdirectories(directory):
+    """Return the subdirectories of directory as os.DirEntry objects"""
+    with os.scandir(directory) as entries:
+        return [entry for entry in entries if entry.is_dir()]
+
+def _model_files(directory):
+    """Return the model files in directory as os.DirEntry objects
+    
+    DirEntry caches the file type from the directory listing, so only the
+    size lookup of a matching file needs a stat() call.
+    """
+    with os.scandir(directory) as entries:
+        return [
+            entry for entry in entries
+            if os.path.splitext(entry.name)[1] in _MODEL_SUFFIXES and entry.is_file()
+        ]
+
+@contextlib.contextmanager
+def _suppressed_output():
+    """Discard everything written to stdout and stderr inside the block
+    
+    The file descriptors themselves are redirected, so output printed by
+    native code such as llama.cpp is discarded along with Python's. This
+    applies to the whole process, so only wrap short, one-off calls.
+    """
+    sys.stdout.flush()
+    sys.stderr.flush()
+    saved_fds = [os.dup(1), os.dup(2)]
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    try:
+        os.dup2(devnull, 1)
+        os.dup2(devnull, 2)
+        with contextlib.redirect_stdout(None), contextlib.redirect_stderr(None):
+            yield
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os.dup2(saved_fds[0], 1)
+        os.dup2(saved_fds[1], 2)
+        for fd in saved_fds + [devnull]:
+            os.close(fd)
+
+class LazyErrorResult(dict):
+    """Error result dict whose "traceback" entry is formatted on first access
+    
+    Formatting a traceback walks every frame and builds strings, which is
+    wasted work for callers that only check result["error"]. The exception is
+    kept and the traceback text is produced (and memoized) only when read.
+    """
+    
+    def __init__(self, error, exc):
+        super().__init__(error=error)
+        self._exc = exc
+    
+    def __missing__(self, key):
+        if key != "traceback":
+            raise KeyError(key)
+        value = "".join(traceback.format_exception(type(self._exc), self._exc, self._exc.__traceback__))
+        self[key] = value
+        return value
+    
+    def __contains__(self, key):
+        return key == "traceback" or super().__contains__(key)
+    
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+def _prefetch_weights(paths):
+    """Ask the kernel to start reading model weight files into the page cache
+    
+    POSIX_FADV_WILLNEED queues asynchronous readahead for each whole file, so
+    the disk is kept busy with many outstanding reads while the loader parses
+    headers and allocates tensors, instead of faulting weights in page by page.
+    This is a no-op where posix_fadvise is unavailable (e.g. macOS).
+    """
+    if not hasattr(os, "posix_fadvise"):
+        return
+    
+    for path in paths:
+        try:
+            fd = os.open(path, os.O_RDONLY)
+            try:
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+            finally:
+                os.close(fd)
+        except OSError as e:
+            print(f"Could not prefetch {path}: {e}")
+
 class SimpleModelManager:
     """Simple model manager that handles loading and inference"""
     
     def __init__(self):
         self.models = {}
+        self.generators = {}
         self.optimized_params = self._get_optimized_params()
     
     def _get_optimized_params(self):
@@ -31,7 +151,9 @@ class SimpleModelManager:
             "n_threads": 4,          # Default: Use 4 threads
             "n_gpu_layers": 0,       # Default: No GPU acceleration
             "n_batch": 512,          # Default batch size
-            "n_ctx": 2048            # Default context size
+            "n_ctx": 2048,           # Default context size
+            "prompt_cache_bytes": 1 << 30,  # Default 1 GB of cached prompt KV state
+            "use_mlock": False       # Default: let the OS page weights in and out
         }
         
         try:
@@ -57,12 +179,16 @@ class SimpleModelManager:
                 if memory_gb >= 32:  # High memory system
                     params["n_batch"] = 1024
                     params["n_ctx"] = 4096  # Allow larger context window
+                    params["prompt_cache_bytes"] = 4 << 30
+                    params["use_mlock"] = True  # Keep mapped weights resident
                 elif memory_gb >= 16:  # Medium memory system
                     params["n_batch"] = 512
                     params["n_ctx"] = 2048
+                    params["prompt_cache_bytes"] = 2 << 30
                 else:  # Low memory system
                     params["n_batch"] = 256
                     params["n_ctx"] = 1024
+                    params["prompt_cache_bytes"] = 512 << 20
             except ImportError:
                 # If psutil is not available, use conservative defaults
                 pass
@@ -81,66 +207,121 @@ class SimpleModelManager:
         # Search in quantized directory
         quantized_dir = BASE_DIR / "LLM-MODELS" / "quantized"
         if quantized_dir.exists():
-            for format_dir in quantized_dir.glob("*"):
-                if format_dir.is_dir():
-                    for model_file in format_dir.glob("*"):
-                        if model_file.is_file() and model_file.suffix in ['.bin', '.gguf', '.safetensors']:
-                            # Determine model format details
-                            model_format = format_dir.name
-                            model_ext = model_file.suffix.lower().replace('.', '')
+            for format_dir in _subdirectories(quantized_dir):
+                for model_file in _model_files(format_dir.path):
+                    # Determine model format details
+                    model_format = format_dir.name
+                    model_ext = os.path.splitext(model_file.name)[1].lower().replace('.', '')
+                    
+                    # Add format details based on file extension
+                    format_details = model_format
+                    if model_ext in ['gguf', 'ggml', 'safetensors', 'bin', 'pt']:
+                        format_details = f"{model_format} ({model_ext})"
+                        
+                    # Try to determine the model type from the filename
+                    model_family = "unknown"
+                    for family in ["llama", "mistral", "tinyllama", "phi", "mixtral", "gemma", "gpt"]:
+                        if family in model_file.name.lower():
+                            model_family = family
+                            break
                             
-                            # Add format details based on file extension
-                            format_details = model_format
-                            if model_ext in ['gguf', 'ggml', 'safetensors', 'bin', 'pt']:
-                                format_details = f"{model_format} ({model_ext})"
-                                
-                            # Try to determine the model type from the filename
-                            model_family = "unknown"
-                            for family in ["llama", "mistral", "tinyllama", "phi", "mixtral", "gemma", "gpt"]:
-                                if family in model_file.name.lower():
-                                    model_family = family
-                                    break
-                                    
-                            models.append({
-                                "path": str(model_file.relative_to(BASE_DIR)),
-                                "type": "quantized",
-                                "format": format_details,
-                                "family": model_family,
-                                "full_path": str(model_file),
-                                "size_mb": round(model_file.stat().st_size / (1024 * 1024), 2)
-                            })
+                    models.append({
+                        "path": os.path.join("LLM-MODELS", "quantized", format_dir.name, model_file.name),
+                        "type": "quantized",
+                        "format": format_details,
+                        "family": model_family,
+                        "full_path": model_file.path,
+                        "size_mb": round(model_file.stat().st_size / (1024 * 1024), 2)
+                    })
         
         # Search in open-source directory
         open_source_dir = BASE_DIR / "LLM-MODELS" / "open-source"
         if open_source_dir.exists():
-            for family_dir in open_source_dir.glob("*"):
-                if family_dir.is_dir():
-                    for size_dir in family_dir.glob("*"):
-                        if size_dir.is_dir():
-                            for model_file in size_dir.glob("*"):
-                                if model_file.is_file() and model_file.suffix in ['.bin', '.gguf', '.safetensors']:
-                                    # Determine model format details
-                                    model_ext = model_file.suffix.lower().replace('.', '')
-                                    
-                                    # Add format details based on file extension
-                                    format_details = model_ext
-                                    if model_ext in ['gguf', 'ggml', 'safetensors', 'bin', 'pt']:
-                                        format_details = model_ext.upper()
-                                    
-                                    models.append({
-                                        "path": str(model_file.relative_to(BASE_DIR)),
-                                        "type": "open-source",
-                                        "format": format_details,
-                                        "family": family_dir.name,
-                                        "size": size_dir.name,
-                                        "full_path": str(model_file),
-                                        "size_mb": round(model_file.stat().st_size / (1024 * 1024), 2)
-                                    })
+            for family_dir in _subdirectories(open_source_dir):
+                for size_dir in _subdirectories(family_dir.path):
+                    for model_file in _model_files(size_dir.path):
+                        # Determine model format details
+                        model_ext = os.path.splitext(model_file.name)[1].lower().replace('.', '')
+                        
+                        # Add format details based on file extension
+                        format_details = model_ext
+                        if model_ext in ['gguf', 'ggml', 'safetensors', 'bin', 'pt']:
+                            format_details = model_ext.upper()
+                        
+                        models.append({
+                            "path": os.path.join("LLM-MODELS", "open-source", family_dir.name, size_dir.name, model_file.name),
+                            "type": "open-source",
+                            "format": format_details,
+                            "family": family_dir.name,
+                            "size": size_dir.name,
+                            "full_path": model_file.path,
+                            "size_mb": round(model_file.stat().st_size / (1024 * 1024), 2)
+                        })
         
         return models
     
-    def load_model(self, model_path):
-        """Load a model from the given path"""
+    def _get_quantization_config(self, quant):
+        """Build a bitsandbytes quantization config for transformers models
+        
+        quant is "nf4" (4-bit NormalFloat), "int8" or "none". Quantized weights
+        cut memory bandwidth during decode, which bounds tokens/sec.
+        """
+        if not quant or quant == "none":
+            return None
+        
+        if quant not in ("nf4", "int8"):
+            raise ValueError(f"Unsupported quantization mode: {quant} (expected 'nf4', 'int8' or 'none')")
+        
+        import torch
+        from transformers import BitsAndBytesConfig
+        
+        if quant == "nf4":
+            return BitsAndBytesConfig(
+                load_in_4bit=True,
+                bnb_4bit_compute_dtype=torch.bfloat16,
+                bnb_4bit_quant_type="nf4"
+            )
+        return BitsAndBytesConfig(load_in_8bit=True)
+    
+    def _create_llama(self, full_path, **extra_params):
+        """Create a llama-cpp-python model with the optimized parameters
+        
+        Weights are memory-mapped and, on high-memory systems, locked in RAM so
+        the first generations do not stall on page faults.
+        
+        A RAM prompt cache is attached so a prompt sharing a prefix with an
+        earlier one (system prompt, chat history) restores the saved KV state
+        for that prefix instead of re-running prefill over it. The cache is
+        LRU-evicted once it exceeds prompt_cache_bytes.
+        """
+        from llama_cpp import Llama, LlamaRAMCache
+        
+        _prefetch_weights([full_path])
+        model = Llama(
+            model_path=full_path,
+            n_ctx=self.optimized_params["n_ctx"],
+            n_batch=self.optimized_params["n_batch"],
+            n_threads=self.optimized_params["n_threads"],
+            n_gpu_layers=self.optimized_params["n_gpu_layers"],
+            use_mmap=True,
+            use_mlock=self.optimized_params["use_mlock"],
+            **extra_params
+        )
+        model.set_cache(LlamaRAMCache(capacity_bytes=self.optimized_params["prompt_cache_bytes"]))
+        return model
+    
+    def load_model(self, model_path, quant="none", draft_path=None):
+        """Load a model from the given path
+        
+        quant selects bitsandbytes quantization ("nf4", "int8" or "none") for
+        transformers models; it is ignored for GGUF/GGML models, which are
+        already quantized.
+        
+        draft_path optionally names a small model sharing the target's tokenizer
+        (e.g. TinyLlama for a Llama target). Transformers models then use it for
+        speculative (assisted) decoding: the draft proposes tokens and the target
+        verifies them in a single forward pass, with the same output distribution.
+        """
         full_path = str(BASE_DIR / model_path)
         
         # Check if model is already loaded
@@ -159,26 +340,21 @@ class SimpleModelManager:
             # Determine file extension
             file_ext = os.path.splitext(full_path)[1].lower()
             
+            if draft_path and file_ext not in ['.safetensors', '.bin', '.pt']:
+                print("Draft models are only supported for transformers models; using normal decoding")
+            
             # For GGUF models, use llama-cpp-python
             if file_ext == '.gguf':
                 try:
-                    from llama_cpp import Llama
-                    
                     # Load the model with optimized parameters
-                    model = Llama(
-                        model_path=full_path,
-                        n_ctx=self.optimized_params["n_ctx"],
-                        n_batch=self.optimized_params["n_batch"],
-                        n_threads=self.optimized_params["n_threads"],
-                        n_gpu_layers=self.optimized_params["n_gpu_layers"]
-                    )
+                    model = self._create_llama(full_path)
                     
-                    self.models[model_path] = {
+                    self._register_model(model_path, {
                         "model": model,
                         "type": "llama.cpp",
                         "model_format": "gguf",
                         "loaded_at": time.time()
-                    }
+                    })
                     
                     print(f"Successfully loaded GGUF model: {model_path}")
                     return True
@@ -193,24 +369,18 @@ class SimpleModelManager:
             # For GGML models (older format, also using llama-cpp-python)
             elif file_ext == '.ggml' or file_ext == '.bin' and 'ggml' in full_path.lower():
                 try:
-                    from llama_cpp import Llama
-                    
                     # Load the model with optimized parameters
-                    model = Llama(
-                        model_path=full_path,
-                        n_ctx=self.optimized_params["n_ctx"],
-                        n_batch=self.optimized_params["n_batch"],
-                        n_threads=self.optimized_params["n_threads"],
-                        n_gpu_layers=self.optimized_params["n_gpu_layers"],
+                    model = self._create_llama(
+                        full_path,
                         legacy=True        # Required for GGML models
                     )
                     
-                    self.models[model_path] = {
+                    self._register_model(model_path, {
                         "model": model,
                         "type": "llama.cpp",
                         "model_format": "ggml",
                         "loaded_at": time.time()
-                    }
+                    })
                     
                     print(f"Successfully loaded GGML model: {model_path}")
                     return True
@@ -233,15 +403,37 @@ class SimpleModelManager:
                     
                     # Attempt to load with AutoModelForCausalLM
                     print(f"Loading PyTorch model from {model_dir}")
+                    _prefetch_weights([
+                        os.path.join(model_dir, name) for name in os.listdir(model_dir)
+                        if name.endswith(('.safetensors', '.bin', '.pt'))
+                    ])
                     tokenizer = transformers.AutoTokenizer.from_pretrained(model_dir)
+                    load_kwargs = {
+                        "device_map": "auto",  # Use the best available device
+                        "torch_dtype": "auto"  # Automatically choose precision
+                    }
+                    quantization_config = self._get_quantization_config(quant)
+                    if quantization_config is not None:
+                        print(f"Quantizing model weights on load: {quant}")
+                        load_kwargs["quantization_config"] = quantization_config
                     model = transformers.AutoModelForCausalLM.from_pretrained(
                         model_dir,
-                        device_map="auto",  # Use the best available device
-                        torch_dtype="auto"  # Automatically choose precision
+                        **load_kwargs
                     )
                     
+                    # Load the draft model for speculative decoding if requested
+                    draft_model = None
+                    if draft_path:
+                        draft_full_path = str(BASE_DIR / draft_path)
+                        draft_dir = os.path.dirname(draft_full_path) if os.path.isfile(draft_full_path) else draft_full_path
+                        print(f"Loading draft model from {draft_dir}")
+                        draft_model = transformers.AutoModelForCausalLM.from_pretrained(
+                            draft_dir,
+                            **load_kwargs
+                        )
+                    
                     # Store model, tokenizer and pipeline in the cache
-                    self.models[model_path] = {
+                    self._register_model(model_path, {
                         "model": model,
                         "tokenizer": tokenizer,
                         "pipeline": transformers.pipeline(
@@ -252,8 +444,10 @@ class SimpleModelManager:
                         ),
                         "type": "transformers",
                         "model_format": file_ext.replace('.', ''),
+                        "quant": quant or "none",
+                        "draft_model": draft_model,
                         "loaded_at": time.time()
-                    }
+                    })
                     
                     print(f"Successfully loaded PyTorch model: {model_path}")
                     return True
@@ -273,146 +467,135 @@ class SimpleModelManager:
             print(f"Error loading model: {e}")
             return False
     
-    def generate_text(self, model_path, prompt, system_prompt="", max_tokens=512, temperature=0.7, top_p=0.95, 
-                     frequency_penalty=0.0, presence_penalty=0.0):
-        """Generate text using the specified model"""
-        try:
-            # Load model if not already loaded
-            if model_path not in self.models:
-                success = self.load_model(model_path)
-                if not success:
-                    return {"error": f"Failed to load model: {model_path}"}
+    def format_prompt(self, model_path, prompt, system_prompt=""):
+        """Format a single-turn prompt for the loaded model's backend and family"""
+        model_info = self.models.get(model_path, {})
+        model_type = model_info.get("type", "unknown")
+        full_prompt = prompt
+        
+        # For llama-cpp models (both GGUF and GGML)
+        if model_type == "llama.cpp":
+            # Format the prompt based on model type
+            # For TinyLlama, we use the chat template
+            if "tinyllama" in model_path.lower():
+                if system_prompt:
+                    full_prompt = f"<|system|>\n{system_prompt}</s>\n<|user|>\n{prompt}</s>\n<|assistant|>\n"
+                else:
+                    full_prompt = f"<|user|>\n{prompt}</s>\n<|assistant|>\n"
+            # For Mistral, we use a specific format
+            elif "mistral" in model_path.lower():
+                # Explicitly add <s> token for Mistral models
+                if system_prompt:
+                    full_prompt = f"<s>[INST] {system_prompt}\n\n{prompt} [/INST]"
+                    # Log the first part of the system prompt for debugging
+                    print(f"Using system prompt with context. First 100 chars: {system_prompt[:100]}...")
+                else:
+                    full_prompt = f"<s>[INST] {prompt} [/INST]"
+            # For Llama models
+            elif "llama" in model_path.lower():
+                if system_prompt:
+                    full_prompt = f"<s>[INST] <<SYS>>\n{system_prompt}\n<</SYS>>\n\n{prompt} [/INST]"
+                else:
+                    full_prompt = f"<s>[INST] {prompt} [/INST]"
+            # Generic format for other models
+            else:
+                if system_prompt:
+                    full_prompt = f"### System:\n{system_prompt}\n\n### User:\n{prompt}\n\n### Assistant:\n"
+                else:
+                    full_prompt = f"### User:\n{prompt}\n\n### Assistant:\n"
+        
+        # For transformers models (PyTorch)
+        elif model_type == "transformers":
+            tokenizer = model_info["tokenizer"]
             
-            model_info = self.models[model_path]
-            model = model_info["model"]
-            model_type = model_info["type"]
+            # Determine if it's a chat model from the model path or structure
+            is_chat_model = any(name in model_path.lower() for name in ["chat", "instruct", "dialogue", "convers"])
             
-            # For llama-cpp models (both GGUF and GGML)
-            if model_type == "llama.cpp":
-                full_prompt = ""
-                
-                # Format the prompt based on model type
-                # For TinyLlama, we use the chat template
-                if "tinyllama" in model_path.lower():
-                    if system_prompt:
-                        full_prompt = f"<|system|>\n{system_prompt}</s>\n<|user|>\n{prompt}</s>\n<|assistant|>\n"
-                    else:
-                        full_prompt = f"<|user|>\n{prompt}</s>\n<|assistant|>\n"
-                # For Mistral, we use a specific format
-                elif "mistral" in model_path.lower():
-                    # Explicitly add <s> token for Mistral models
+            # Format the prompt based on model type and whether it's a chat model
+            if is_chat_model:
+                # For chat models, try to use their respective templates if possible
+                if hasattr(tokenizer, "apply_chat_template") and callable(tokenizer.apply_chat_template):
+                    # Use the model's built-in chat template if available
+                    messages = []
                     if system_prompt:
-                        full_prompt = f"<s>[INST] {system_prompt}\n\n{prompt} [/INST]"
-                        # Log the first part of the system prompt for debugging
-                        print(f"Using system prompt with context. First 100 chars: {system_prompt[:100]}...")
-                    else:
-                        full_prompt = f"<s>[INST] {prompt} [/INST]"
-                # For Llama models
-                elif "llama" in model_path.lower():
-                    if system_prompt:
-                        full_prompt = f"<s>[INST] <<SYS>>\n{system_prompt}\n<</SYS>>\n\n{prompt} [/INST]"
-                    else:
-                        full_prompt = f"<s>[INST] {prompt} [/INST]"
-                # Generic format for other models
+                        messages.append({"role": "system", "content": system_prompt})
+                    messages.append({"role": "user", "content": prompt})
+                    full_prompt = tokenizer.apply_chat_template(messages, tokenize=False)
                 else:
+                    # Fallback to a generic template
                     if system_prompt:
-                        full_prompt = f"### System:\n{system_prompt}\n\n### User:\n{prompt}\n\n### Assistant:\n"
-                    else:
-                        full_prompt = f"### User:\n{prompt}\n\n### Assistant:\n"
-                
-                print(f"Generating with llama.cpp prompt: {full_prompt[:50]}...")
-                
-                # Generate response
-                start_time = time.time()
-                
-                # Build the parameters dictionary
-                generation_params = {
-                    "prompt": full_prompt,
-                    "max_tokens": max_tokens,
-                    "temperature": temperature,
-                    "top_p": top_p,
-                    "frequency_penalty": frequency_penalty,
-                    "presence_penalty": presence_penalty,
-                    "stop": ["</s>", "[/INST]", "### User:"],  # Common stop tokens
-                }
-                
-                response = model.create_completion(**generation_params)
-                end_time = time.time()
-                
-                # Extract the generated text
-                generated_text = response["choices"][0]["text"].strip()
-                
-                return {
-                    "response": generated_text,
-                    "model": model_path,
-                    "model_type": model_type,
-                    "model_format": model_info.get("model_format", "unknown"),
-                    "time_taken": round(end_time - start_time, 2),
-                    "tokens_generated": response["usage"]["completion_tokens"],
-                    "total_tokens": response["usage"]["total_tokens"]
-                }
-                
-            # For transformers models (PyTorch)
-            elif model_type == "transformers":
-                pipeline = model_info["pipeline"]
-                tokenizer = model_info["tokenizer"]
-                
-                # Determine if it's a chat model from the model path or structure
-                is_chat_model = any(name in model_path.lower() for name in ["chat", "instruct", "dialogue", "convers"])
-                
-                # Format the prompt based on model type and whether it's a chat model
-                if is_chat_model:
-                    # For chat models, try to use their respective templates if possible
-                    if hasattr(tokenizer, "apply_chat_template") and callable(tokenizer.apply_chat_template):
-                        # Use the model's built-in chat template if available
-                        messages = []
-                        if system_prompt:
-                            messages.append({"role": "system", "content": system_prompt})
-                        messages.append({"role": "user", "content": prompt})
-                        full_prompt = tokenizer.apply_chat_template(messages, tokenize=False)
+                        full_prompt = f"System: {system_prompt}\n\nUser: {prompt}\n\nAssistant:"
                     else:
-                        # Fallback to a generic template
-                        if system_prompt:
-                            full_prompt = f"System: {system_prompt}\n\nUser: {prompt}\n\nAssistant:"
-                        else:
-                            full_prompt = f"User: {prompt}\n\nAssistant:"
+                        full_prompt = f"User: {prompt}\n\nAssistant:"
+            else:
+                # For non-chat models, use a simpler prompt format
+                if system_prompt:
+                    full_prompt = f"{system_prompt}\n\n{prompt}"
                 else:
-                    # For non-chat models, use a simpler prompt format
-                    if system_prompt:
-                        full_prompt = f"{system_prompt}\n\n{prompt}"
-                    else:
-                        full_prompt = prompt
-                
-                print(f"Generating with transformers prompt: {full_prompt[:50]}...")
-                
-                # Generate response
-                start_time = time.time()
-                
-                # Prepare generation parameters
-                gen_kwargs = {
-                    "max_new_tokens": max_tokens,
-                    "temperature": temperature,
-                    "top_p": top_p,
-                    "repetition_penalty": 1.0 + frequency_penalty,  # Convert to repetition penalty format
-                    "do_sample": temperature > 0.0,
-                }
-                
-                # Generate the text
-                response = pipeline(
-                    full_prompt,
-                    **gen_kwargs
+                    full_prompt = prompt
+        
+        return full_prompt
+    
+    def _register_model(self, model_path, model_info):
+        """Build a loaded model's generator, warm it up and make it available
+        
+        A one-token generation runs before the model is registered so one-time
+        costs (GPU kernel compilation, buffer allocation, weight paging) are paid
+        at load time rather than on the first user request.
+        """
+        generator = self._make_generator(model_info)
+        
+        print("Warming up model...")
+        with _suppressed_output():
+            generator(" ", 1, 0.0, 1.0, 0.0, 0.0)
+        
+        self.models[model_path] = model_info
+        self.generators[model_path] = generator
+    
+    def _make_generator(self, model_info):
+        """Build a generate function specialized for a loaded model's backend
+        
+        Called once at load time so each generate call is a single dict lookup
+        rather than a branch on the model type. The returned function takes a
+        formatted prompt and sampling parameters and returns
+        (generated_text, tokens_generated, total_tokens).
+        """
+        model_type = model_info["type"]
+        
+        # For llama-cpp models (both GGUF and GGML)
+        if model_type == "llama.cpp":
+            create_completion = model_info["model"].create_completion
+            
+            def _do_generate(prompt, max_tokens, temperature, top_p, frequency_penalty, presence_penalty):
+                response = create_completion(
+                    prompt=prompt,
+                    max_tokens=max_tokens,
+                    temperature=temperature,
+                    top_p=top_p,
+                    frequency_penalty=frequency_penalty,
+                    presence_penalty=presence_penalty,
+                    stop=STOP_SEQUENCES
                 )
+                usage = response["usage"]
+                return response["choices"][0]["text"].strip(), usage["completion_tokens"], usage["total_tokens"]
+            
+            return _do_generate
+        
+        # For transformers models (PyTorch)
+        if model_type == "transformers":
+            pipeline = model_info["pipeline"]
+            tokenizer = model_info["tokenizer"]
+            
+            def _do_generate(prompt, max_tokens, temperature, top_p, frequency_penalty, presence_penalty):
+                gen_kwargs = _pipeline_kwargs(model_info, max_tokens, temperature, top_p, frequency_penalty)
                 
-                end_time = time.time()
+                # Generate the text - only the new tokens are decoded, so the
+                # prompt never has to be detokenized and stripped back off
+                response = pipeline(prompt, return_full_text=False, **gen_kwargs)
                 
                 # Extract the generated text
                 if isinstance(response, list) and len(response) > 0:
-                    # Extracting the generated text and removing the prompt
-                    generated_text = response[0]["generated_text"]
-                    
-                    # Remove the prompt part from the response if possible
-                    if generated_text.startswith(full_prompt):
-                        generated_text = generated_text[len(full_prompt):].strip()
+                    generated_text = response[0]["generated_text"].strip()
                     
                     # Clean up common artifacts
                     if generated_text.startswith(":") or generated_text.startswith("\n"):
@@ -420,40 +603,67 @@ class SimpleModelManager:
                 else:
                     generated_text = "No response generated"
                 
-                # Count tokens for stats
+                # Count tokens for stats - one batched call lets a fast
+                # tokenizer encode both texts together instead of twice over
                 try:
-                    input_tokens = len(tokenizer.encode(full_prompt))
-                    output_tokens = len(tokenizer.encode(generated_text))
+                    input_ids, output_ids = tokenizer([prompt, generated_text])["input_ids"]
+                    input_tokens = len(input_ids)
+                    output_tokens = len(output_ids)
                 except:
                     input_tokens = 0
                     output_tokens = 0
                 
-                return {
-                    "response": generated_text,
-                    "model": model_path,
-                    "model_type": model_type,
-                    "model_format": model_info.get("model_format", "unknown"),
-                    "time_taken": round(end_time - start_time, 2),
-                    "tokens_generated": output_tokens,
-                    "total_tokens": input_tokens + output_tokens
-                }
-                
-            # Unsupported model type
-            else:
-                return {"error": f"Unsupported model type: {model_type}"}
+                return generated_text, output_tokens, input_tokens + output_tokens
+            
+            return _do_generate
+        
+        raise ValueError(f"Unsupported model type: {model_type}")
+    
+    def _run_generator(self, model_path, full_prompt, max_tokens, temperature, top_p,
+                       frequency_penalty, presence_penalty):
+        """Run a loaded model's generator on a formatted prompt and build the result dict"""
+        model_info = self.models[model_path]
+        
+        start_time = time.time()
+        generated_text, tokens_generated, total_tokens = self.generators[model_path](
+            full_prompt, max_tokens, temperature, top_p, frequency_penalty, presence_penalty
+        )
+        end_time = time.time()
+        
+        return {
+            "response": generated_text,
+            "model": model_path,
+            "model_type": model_info["type"],
+            "model_format": model_info.get("model_format", "unknown"),
+            "time_taken": round(end_time - start_time, 2),
+            "tokens_generated": tokens_generated,
+            "total_tokens": total_tokens
+        }
+    
+    def generate_text(self, model_path, prompt, system_prompt="", max_tokens=512, temperature=0.7, top_p=0.95, 
+                     frequency_penalty=0.0, presence_penalty=0.0, quant="none", draft_path=None):
+        """Generate text using the specified model"""
+        try:
+            # Load model if not already loaded
+            if model_path not in self.models:
+                success = self.load_model(model_path, quant=quant, draft_path=draft_path)
+                if not success:
+                    return {"error": f"Failed to load model: {model_path}"}
+            
+            full_prompt = self.format_prompt(model_path, prompt, system_prompt)
+            print(f"Generating with {self.models[model_path]['type']} prompt: {full_prompt[:50]}...")
+            
+            return self._run_generator(model_path, full_prompt, max_tokens, temperature, top_p,
+                                       frequency_penalty, presence_penalty)
                 
         except Exception as e:
-            import traceback
-            return {
-                "error": f"Error generating text: {str(e)}",
-                "traceback": traceback.format_exc()
-            }
+            return LazyErrorResult(f"Error generating text: {str(e)}", e)
     
     def unload_model(self, model_path):
         """Unload a model to free memory"""
         if model_path in self.models:
             del self.models[model_path]
-            import gc
+            del self.generators[model_path]
             gc.collect()
             return True
         return False
@@ -461,7 +671,7 @@ class SimpleModelManager:
     def unload_all_models(self):
         """Unload all models to free memory"""
         self.models.clear()
-        import gc
+        self.generators.clear()
         gc.collect()
         return True
         
@@ -473,16 +683,18 @@ class SimpleModelManager:
         kept_model = None
         if keep_model_path in self.models:
             kept_model = self.models[keep_model_path]
+            kept_generator = self.generators[keep_model_path]
             
         # Clear all models
         self.models.clear()
+        self.generators.clear()
         
         # Add back the kept model if it exists
         if kept_model:
             self.models[keep_model_path] = kept_model
+            self.generators[keep_model_path] = kept_generator
             
         # Force garbage collection
-        import gc
         gc.collect()
         
         return True
@@ -491,6 +703,22 @@ class SimpleModelManager:
 # Create a global model manager instance
 model_manager = SimpleModelManager()
 
+def _pipeline_kwargs(model_info, max_tokens, temperature, top_p, frequency_penalty):
+    """Build generation kwargs for a transformers text-generation pipeline"""
+    gen_kwargs = {
+        "max_new_tokens": max_tokens,
+        "temperature": temperature,
+        "top_p": top_p,
+        "repetition_penalty": 1.0 + frequency_penalty,  # Convert to repetition penalty format
+        "do_sample": temperature > 0.0,
+    }
+    
+    # Speculative decoding with the draft model, if one was loaded
+    if model_info.get("draft_model") is not None:
+        gen_kwargs["assistant_model"] = model_info["draft_model"]
+    
+    return gen_kwargs
+
 # Add a method to SimpleModelManager to handle conversation history
 def format_conversation_history(self, messages, system_prompt="", model_path=""):
     """Format conversation history based on model type and format"""
@@ -552,8 +780,9 @@ def format_conversation_history(self, messages, system_prompt="", model_path="")
         formatted_messages.append("<|assistant|>")
         
     elif is_mistral:
-        # Mistral format - explicitly add <s> token
-        formatted_content = "<s>"
+        # Mistral format - explicitly add <s> token. Pieces are collected in a
+        # list and joined once so long histories are not copied on every turn
+        parts = ["<s>"]
         
         # Process messages in pairs (user + assistant)
         for i in range(0, len(messages), 2):
@@ -564,35 +793,35 @@ def format_conversation_history(self, messages, system_prompt="", model_path="")
             if i == 0 and system_prompt:
                 # For the first pair with system prompt
                 if user_msg and user_msg.get('role') == 'user':
-                    formatted_content += f"[INST] {system_prompt}\n\n{user_msg.get('content')} [/INST] "
+                    parts.append(f"[INST] {system_prompt}\n\n{user_msg.get('content')} [/INST] ")
                     
                     # Add assistant response if available
                     if assistant_msg and assistant_msg.get('role') == 'assistant':
-                        formatted_content += f"{assistant_msg.get('content')} "
+                        parts.append(f"{assistant_msg.get('content')} ")
                 continue
             
             # Handle regular message pairs
             if user_msg and user_msg.get('role') == 'user':
-                formatted_content += f"[INST] {user_msg.get('content')} [/INST] "
+                parts.append(f"[INST] {user_msg.get('content')} [/INST] ")
                 
                 # Add assistant response if available
                 if assistant_msg and assistant_msg.get('role') == 'assistant':
-                    formatted_content += f"{assistant_msg.get('content')} "
+                    parts.append(f"{assistant_msg.get('content')} ")
         
         # If the last message is from a user and wasn't handled in the loop
         if messages[-1].get('role') == 'user' and (len(messages) % 2 == 1):
             # Make sure we don't repeat the prompt if it was the only message
             if len(messages) > 1 or not system_prompt:
-                formatted_content += f"[INST] {messages[-1].get('content')} [/INST]"
+                parts.append(f"[INST] {messages[-1].get('content')} [/INST]")
                 
-        formatted_messages = [formatted_content]
+        formatted_messages = ["".join(parts)]
     
     elif is_llama:
         # Llama 2 chat format
         if system_prompt:
-            current_content = f"<s>[INST] <<SYS>>\n{system_prompt}\n<</SYS>>\n\n"
+            parts = [f"<s>[INST] <<SYS>>\n{system_prompt}\n<</SYS>>\n\n"]
         else:
-            current_content = "<s>[INST] "
+            parts = ["<s>[INST] "]
             
         # Track if we need to start a new instruction
         need_inst_tag = False
@@ -603,18 +832,19 @@ def format_conversation_history(self, messages, system_prompt="", model_path="")
             
             if role == 'user':
                 if need_inst_tag:
-                    current_content += " [INST] "
-                current_content += content
+                    parts.append(" [INST] ")
+                parts.append(content)
                 if i == len(messages) - 1:  # If this is the last message
-                    current_content += " [/INST]"
+                    parts.append(" [/INST]")
                 else:
-                    current_content += " [/INST] "
+                    parts.append(" [/INST] ")
                 need_inst_tag = False
             elif role == 'assistant':
-                current_content += content + " "
+                parts.append(content)
+                parts.append(" ")
                 need_inst_tag = True
         
-        formatted_messages = [current_content]
+        formatted_messages = ["".join(parts)]
         
     else:
         # Generic format (works for most models)
@@ -643,16 +873,20 @@ def list_models():
     """List all available models"""
     return model_manager.find_models()
 
-def load_model(model_path, unload_others=True):
-    """Load a model by path"""
+def load_model(model_path, unload_others=True, quant="none", draft_path=None):
+    """Load a model by path
+    
+    quant is "nf4", "int8" or "none" and only applies to transformers models.
+    draft_path names an optional draft model for speculative decoding.
+    """
     # If requested, unload other models first to free memory
     if unload_others:
         model_manager.unload_other_models(model_path)
     
-    return model_manager.load_model(model_path)
+    return model_manager.load_model(model_path, quant=quant, draft_path=draft_path)
 
 def generate(model_path, prompt, system_prompt="", max_tokens=512, temperature=0.7, 
-           top_p=0.95, frequency_penalty=0.0, presence_penalty=0.0):
+           top_p=0.95, frequency_penalty=0.0, presence_penalty=0.0, quant="none", draft_path=None):
     """Generate text using the specified model"""
     return model_manager.generate_text(
         model_path=model_path,
@@ -662,21 +896,21 @@ def generate(model_path, prompt, system_prompt="", max_tokens=512, temperature=0
         temperature=temperature,
         top_p=top_p,
         frequency_penalty=frequency_penalty,
-        presence_penalty=presence_penalty
+        presence_penalty=presence_penalty,
+        quant=quant,
+        draft_path=draft_path
     )
 
 def generate_with_history(model_path, messages, system_prompt="", max_tokens=512, 
-                         temperature=0.7, top_p=0.95, frequency_penalty=0.0, presence_penalty=0.0):
+                         temperature=0.7, top_p=0.95, frequency_penalty=0.0, presence_penalty=0.0,
+                         quant="none", draft_path=None):
     """Generate text using conversation history"""
     try:
         # Load model if not already loaded
-        if not model_manager.load_model(model_path):
+        if (model_path not in model_manager.models
+                and not model_manager.load_model(model_path, quant=quant, draft_path=draft_path)):
             return {"error": f"Failed to load model: {model_path}"}
         
-        model_info = model_manager.models[model_path]
-        model = model_info["model"]
-        model_type = model_info.get("type", "unknown")
-        
         # Format the conversation history
         formatted_prompt = model_manager.format_conversation_history(
             messages, 
@@ -684,110 +918,96 @@ def generate_with_history(model_path, messages, system_prompt="", max_tokens=512
             model_path=model_path
         )
         
-        # No need to check for duplicate <s> tokens since we now handle them properly
-        
         print(f"Generating with conversation history: {formatted_prompt[:100]}...")
         
-        # For llama.cpp models (GGUF/GGML)
-        if model_type == "llama.cpp":
-            # Generate response
-            start_time = time.time()
-            
-            # Build the parameters dictionary
-            generation_params = {
-                "prompt": formatted_prompt,
-                "max_tokens": max_tokens,
-                "temperature": temperature,
-                "top_p": top_p,
-                "frequency_penalty": frequency_penalty,
-                "presence_penalty": presence_penalty,
-                "stop": ["</s>", "[/INST]", "### User:"],  # Common stop tokens
-            }
-            
-            response = model.create_completion(**generation_params)
-            end_time = time.time()
-            
-            # Extract the generated text
-            generated_text = response["choices"][0]["text"].strip()
-            
-            return {
-                "response": generated_text,
-                "model": model_path,
-                "model_type": model_type,
-                "model_format": model_info.get("model_format", "unknown"),
-                "time_taken": round(end_time - start_time, 2),
-                "tokens_generated": response["usage"]["completion_tokens"],
-                "total_tokens": response["usage"]["total_tokens"]
-            }
-            
-        # For transformers models (PyTorch)
-        elif model_type == "transformers":
-            pipeline = model_info["pipeline"]
-            tokenizer = model_info["tokenizer"]
-            
-            # Generate response
-            start_time = time.time()
-            
-            # Prepare generation parameters
-            gen_kwargs = {
-                "max_new_tokens": max_tokens,
-                "temperature": temperature,
-                "top_p": top_p,
-                "repetition_penalty": 1.0 + frequency_penalty,  # Convert to repetition penalty format
-                "do_sample": temperature > 0.0,
-            }
-            
-            # Generate the text
-            response = pipeline(
-                formatted_prompt,
-                **gen_kwargs
-            )
-            
-            end_time = time.time()
-            
-            # Extract the generated text
-            if isinstance(response, list) and len(response) > 0:
-                # Extracting the generated text and removing the prompt
-                generated_text = response[0]["generated_text"]
-                
-                # Remove the prompt part from the response if possible
-                if generated_text.startswith(formatted_prompt):
-                    generated_text = generated_text[len(formatted_prompt):].strip()
-                
-                # Clean up common artifacts
-                if generated_text.startswith(":") or generated_text.startswith("\n"):
-                    generated_text = generated_text.lstrip(":\n ")
-            else:
-                generated_text = "No response generated"
-            
-            # Count tokens for stats
-            try:
-                input_tokens = len(tokenizer.encode(formatted_prompt))
-                output_tokens = len(tokenizer.encode(generated_text))
-            except:
-                input_tokens = 0
-                output_tokens = 0
-            
-            return {
-                "response": generated_text,
-                "model": model_path,
-                "model_type": model_type,
-                "model_format": model_info.get("model_format", "unknown"),
-                "time_taken": round(end_time - start_time, 2),
-                "tokens_generated": output_tokens,
-                "total_tokens": input_tokens + output_tokens
-            }
-            
-        # Unsupported model type
-        else:
-            return {"error": f"Unsupported model type for history: {model_type}"}
+        return model_manager._run_generator(model_path, formatted_prompt, max_tokens, temperature, top_p,
+                                            frequency_penalty, presence_penalty)
             
     except Exception as e:
-        import traceback
-        return {
-            "error": f"Error generating text with history: {str(e)}",
-            "traceback": traceback.format_exc()
-        }
+        return LazyErrorResult(f"Error generating text with history: {str(e)}", e)
+
+def generate_stream(model_path, prompt="", system_prompt="", max_tokens=512, temperature=0.7,
+                    top_p=0.95, frequency_penalty=0.0, presence_penalty=0.0, quant="none",
+                    draft_path=None, messages=None):
+    """Generate text incrementally, yielding text chunks as the model produces them
+    
+    Pass messages to generate from conversation history instead of a single
+    prompt. quant and draft_path apply when the model is not loaded yet, as
+    in generate. Unlike generate, errors are raised rather than returned as a
+    dict, since the caller is already consuming output.
+    """
+    if (model_path not in model_manager.models
+            and not model_manager.load_model(model_path, quant=quant, draft_path=draft_path)):
+        raise RuntimeError(f"Failed to load model: {model_path}")
+    
+    model_info = model_manager.models[model_path]
+    model_type = model_info["type"]
+    
+    if messages:
+        full_prompt = model_manager.format_conversation_history(
+            messages,
+            system_prompt=system_prompt,
+            model_path=model_path
+        )
+    else:
+        full_prompt = model_manager.format_prompt(model_path, prompt, system_prompt)
+    
+    # For llama.cpp models (GGUF/GGML)
+    if model_type == "llama.cpp":
+        for chunk in model_info["model"].create_completion(
+            prompt=full_prompt,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            top_p=top_p,
+            frequency_penalty=frequency_penalty,
+            presence_penalty=presence_penalty,
+            stop=STOP_SEQUENCES,
+            stream=True
+        ):
+            yield chunk["choices"][0]["text"]
+    
+    # For transformers models (PyTorch)
+    elif model_type == "transformers":
+        from transformers import StoppingCriteria, StoppingCriteriaList, TextIteratorStreamer
+        
+        class _StopWhenSet(StoppingCriteria):
+            """Stop generating once the consumer has gone away"""
+            def __call__(self, input_ids, scores, **kwargs):
+                return stop_event.is_set()
+        
+        stop_event = threading.Event()
+        errors = []
+        streamer = TextIteratorStreamer(model_info["tokenizer"], skip_prompt=True, skip_special_tokens=True)
+        gen_kwargs = _pipeline_kwargs(model_info, max_tokens, temperature, top_p, frequency_penalty)
+        gen_kwargs["streamer"] = streamer
+        gen_kwargs["stopping_criteria"] = StoppingCriteriaList([_StopWhenSet()])
+        
+        def _run_pipeline():
+            # A failed pipeline never ends the streamer itself, which would
+            # leave the consumer waiting forever
+            try:
+                model_info["pipeline"](full_prompt, **gen_kwargs)
+            except Exception as e:
+                errors.append(e)
+                streamer.end()
+        
+        # The pipeline blocks until generation finishes, so run it in a thread
+        # and read decoded text from the streamer as tokens arrive
+        thread = threading.Thread(target=_run_pipeline, daemon=True)
+        thread.start()
+        try:
+            yield from streamer
+        finally:
+            # If the consumer stopped early (e.g. the client disconnected),
+            # stop the generation and wait for the model to be free again
+            stop_event.set()
+            thread.join()
+        if errors:
+            raise errors[0]
+    
+    # Unsupported model type
+    else:
+        raise RuntimeError(f"Unsupported model type: {model_type}")
 
 def unload_model(model_path):
     """Unload a specific model"""
@@ -795,7 +1015,6 @@ def unload_model(model_path):
 
 def unload_all():
     """Unload all models"""
-    import gc
     result = model_manager.unload_all_models()
     
     # Additional memory cleanup
@@ -817,8 +1036,85 @@ def unload_all():
         
     return result
 
+# Longest request line the server accepts; a long chat history in
+# "messages" easily exceeds asyncio's 64 KiB default
+_REQUEST_LINE_LIMIT = 16 * 1024 * 1024
+
+async def _discard_line(reader):
+    """Skip the rest of the current input line, up to and including its newline"""
+    while True:
+        try:
+            await reader.readuntil(b"\n")
+            return
+        except asyncio.LimitOverrunError as e:
+            await reader.readexactly(e.consumed)
+        except asyncio.IncompleteReadError:
+            return
+
 # Test functionality if script is run directly
-if __name__ == "__main__":
+async def _handle_client(reader, writer, executor):
+    """Answer JSON-lines generation requests from one client connection
+    
+    Each line is a JSON object with a "model" path and either a "prompt" or
+    "messages", plus any generate keyword arguments. Each reply is the result
+    dict as one JSON line. A line over the reader's limit is skipped and
+    answered with an error, so the requests queued after it still get replies.
+    """
+    loop = asyncio.get_running_loop()
+    try:
+        while True:
+            try:
+                line = await reader.readuntil(b"\n")
+            except asyncio.IncompleteReadError as e:
+                # The client closed the connection; answer a final unterminated line
+                line = e.partial
+                if not line:
+                    break
+            except asyncio.LimitOverrunError:
+                await _discard_line(reader)
+                line = None
+            
+            try:
+                if line is None:
+                    raise ValueError("request line is too long")
+                request = _json_loads(line)
+                if not isinstance(request, dict):
+                    raise ValueError("request must be a JSON object")
+                model_path = request.pop("model")
+                generate_fn = generate_with_history if "messages" in request else generate
+                result = await loop.run_in_executor(executor, functools.partial(generate_fn, model_path, **request))
+            except (ValueError, KeyError, TypeError) as e:
+                result = {"error": f"Invalid request: {e}"}
+            
+            writer.write(_json_dumps(result) + b"\n")
+            await writer.drain()
+    finally:
+        writer.close()
+        await writer.wait_closed()
+
+async def serve(host="127.0.0.1", port=5200):
+    """Serve generation requests from many concurrent clients
+    
+    Connections are handled on the event loop, so clients can connect, queue
+    requests and read replies concurrently while sharing the loaded models.
+    Generation itself runs on a single worker thread because llama.cpp and
+    transformers model objects are not safe to call from several threads.
+    """
+    executor = ThreadPoolExecutor(max_workers=1)
+    try:
+        server = await asyncio.start_server(
+            functools.partial(_handle_client, executor=executor), host, port,
+            limit=_REQUEST_LINE_LIMIT
+        )
+        print(f"Serving generation requests on {host}:{port}")
+        async with server:
+            await server.serve_forever()
+    finally:
+        # Drop queued requests; a generation already running cannot be interrupted
+        executor.shutdown(wait=False, cancel_futures=True)
+
+def _interactive():
+    """Pick a model and prompt from stdin and stream one response"""
     # List available models
     print("Available models:")
     models = list_models()
@@ -840,18 +1136,18 @@ if __name__ == "__main__":
                     # Test generation
                     prompt = input("\nEnter a prompt: ")
                     if prompt:
-                        print("\nGenerating response...")
-                        result = generate(model_path, prompt)
+                        print("\nGenerated response:")
+                        print("-" * 40)
+                        
+                        # Stream the response to stdout as it is generated
+                        start_time = time.time()
+                        for text in generate_stream(model_path, prompt):
+                            sys.stdout.write(text)
+                            sys.stdout.flush()
+                        print()
                         
-                        if "error" in result:
-                            print(f"Error: {result['error']}")
-                        else:
-                            print("\nGenerated response:")
-                            print("-" * 40)
-                            print(result["response"])
-                            print("-" * 40)
-                            print(f"Time taken: {result['time_taken']} seconds")
-                            print(f"Tokens generated: {result.get('tokens_generated', 'N/A')}")
+                        print("-" * 40)
+                        print(f"Time taken: {round(time.time() - start_time, 2)} seconds")
                     
                     # Unload model
                     unload_model(model_path)
@@ -861,4 +1157,16 @@ if __name__ == "__main__":
         except Exception as e:
             print(f"Error: {e}")
     else:
-        print("No models found. Please download a model first.")
\ No newline at end of file
+        print("No models found. Please download a model first.")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Minimal LLM inference")
+    parser.add_argument("--serve", action="store_true", help="Serve JSON-lines generation requests over TCP")
+    parser.add_argument("--host", default="127.0.0.1", help="Host to bind when serving")
+    parser.add_argument("--port", type=int, default=5200, help="Port to bind when serving")
+    args = parser.parse_args()
+    
+    if args.serve:
+        asyncio.run(serve(args.host, args.port))
+    else:
+        _interactive()
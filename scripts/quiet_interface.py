@@ -3,17 +3,23 @@
 
 import os
 import sys
-import socketserver
+import contextlib
+import errno
+import functools
+import gzip
+import zlib
 import json
 import http.server
 import urllib.parse
 from pathlib import Path
 import threading
+import signal
 import webbrowser
 import time
 import logging
 import traceback
 import html
+import re
 
 # Error handling utilities
 class ErrorHandler:
@@ -34,24 +40,33 @@ class ErrorHandler:
         return formatted
     
     @staticmethod
-    def log_error(error, context="", level=logging.ERROR, include_traceback=False):
-        """Log an error with consistent formatting"""
-        logger = logging.getLogger("llm_interface")
+    def log_error(error, context="", level=logging.ERROR, include_traceback=False, tb=None):
+        """Log an error with consistent formatting
         
+        The traceback is only formatted when debug logging is enabled; pass
+        tb to reuse one that was already formatted.
+        """
+        # Filtered-out errors cost a single level check (the traceback is
+        # logged at DEBUG, so it is filtered whenever level is)
+        if not logger.isEnabledFor(level):
+            return
+        
+        # Same message as format_error, but interpolated by the logger only
+        # if the record is actually emitted
         if context:
-            message = f"[{context}] {ErrorHandler.format_error(error, include_traceback=False)}"
+            logger.log(level, "[%s] Error: %s - %s", context, type(error).__name__, error)
         else:
-            message = ErrorHandler.format_error(error, include_traceback=False)
-            
-        logger.log(level, message)
+            logger.log(level, "Error: %s - %s", type(error).__name__, error)
         
-        if include_traceback:
-            logger.debug(f"Traceback for error in {context or 'unknown context'}:\n{traceback.format_exc()}")
+        if include_traceback and logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Traceback for error in %s:\n%s", context or 'unknown context', tb or traceback.format_exc())
     
     @staticmethod
     def handle_api_error(error, context="", include_traceback=False):
         """Format an error for API response"""
-        ErrorHandler.log_error(error, context, include_traceback=include_traceback)
+        # Format the traceback once for both the log and the response
+        tb = traceback.format_exc() if include_traceback else None
+        ErrorHandler.log_error(error, context, include_traceback=include_traceback, tb=tb)
         
         response = {
             "error": str(error),
@@ -59,8 +74,8 @@ class ErrorHandler:
             "context": context
         }
         
-        if include_traceback:
-            response["traceback"] = traceback.format_exc()
+        if tb:
+            response["traceback"] = tb
             
         return response
     
@@ -84,6 +99,22 @@ except ImportError:
     print("Jinja2 not installed. Please install with: pip install jinja2")
     jinja2 = None
 
+# Use orjson for API requests and responses when available - it works on
+# bytes directly and is several times faster than the json module. Its
+# JSONDecodeError subclasses json.JSONDecodeError, so error handling is shared.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if orjson:
+    _json_dumps = orjson.dumps
+    _json_loads = orjson.loads
+else:
+    def _json_dumps(data):
+        return json.dumps(data).encode('utf-8')
+    _json_loads = json.loads
+
 # Define the port range to try
 START_PORT = 5100
 END_PORT = 5110
@@ -99,12 +130,40 @@ TEMPLATES_DIR = BASE_DIR / "templates"
 LAYOUTS_DIR = TEMPLATES_DIR / "layouts"
 COMPONENTS_DIR = TEMPLATES_DIR / "components"
 ASSETS_DIR = TEMPLATES_DIR / "assets"
+TEMPLATE_CACHE_DIR = BASE_DIR / ".jinja_cache"
+
+# Check for environment flags
+RAG_ENABLED = os.environ.get("LLM_RAG_ENABLED") == "1"
+DEBUG_MODE = os.environ.get("LLM_DEBUG_MODE") == "1"
+
+def _worker_count():
+    """Return the number of server processes set by LLM_WORKERS (default 1)"""
+    value = os.environ.get("LLM_WORKERS", "1")
+    try:
+        workers = int(value)
+    except ValueError:
+        workers = 0
+    if workers < 1:
+        print(f"Invalid LLM_WORKERS value {value!r}, using 1 worker")
+        return 1
+    return workers
+
+# Number of server processes; each loads its own copy of the models it runs
+WORKERS = _worker_count()
 
 # Set up Jinja2 environment if available
 if jinja2:
     try:
         template_loader = jinja2.FileSystemLoader(searchpath=TEMPLATES_DIR)
-        template_env = jinja2.Environment(loader=template_loader)
+        # Compiled templates are cached on disk so they survive restarts, and
+        # template files are only re-checked for changes in debug mode
+        TEMPLATE_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        template_env = jinja2.Environment(
+            loader=template_loader,
+            bytecode_cache=jinja2.FileSystemBytecodeCache(directory=str(TEMPLATE_CACHE_DIR)),
+            auto_reload=DEBUG_MODE,
+            cache_size=400
+        )
         print(f"Template directory: {TEMPLATES_DIR}")
     except Exception as e:
         print(f"Error setting up Jinja2: {e}")
@@ -112,10 +171,6 @@ if jinja2:
 else:
     template_env = None
 
-# Check for environment flags
-RAG_ENABLED = os.environ.get("LLM_RAG_ENABLED") == "1"
-DEBUG_MODE = os.environ.get("LLM_DEBUG_MODE") == "1"
-
 # Configure logging based on debug mode
 if DEBUG_MODE:
     logging.basicConfig(level=logging.DEBUG, 
@@ -124,6 +179,8 @@ if DEBUG_MODE:
 else:
     logging.basicConfig(level=logging.ERROR)
 
+logger = logging.getLogger("llm_interface")
+
 # Setup paths
 try:
     # Ensure base directories exist
@@ -134,19 +191,69 @@ try:
         if path not in sys.path:
             sys.path.insert(0, path)
     
-    # Log configuration details when in debug mode
-    if DEBUG_MODE:
-        print(f"BASE_DIR: {BASE_DIR}")
-        print(f"SCRIPT_DIR: {SCRIPT_DIR}")
-        print(f"RAG_ENABLED: {RAG_ENABLED}")
-        print(f"DEBUG_MODE: {DEBUG_MODE}")
-        print(f"sys.path: {sys.path}")
+    # Log configuration details (shown in debug mode)
+    logger.debug("BASE_DIR: %s", BASE_DIR)
+    logger.debug("SCRIPT_DIR: %s", SCRIPT_DIR)
+    logger.debug("RAG_ENABLED: %s", RAG_ENABLED)
+    logger.debug("DEBUG_MODE: %s", DEBUG_MODE)
+    logger.debug("sys.path: %s", sys.path)
 except Exception as e:
     print(f"Error during path setup: {e}")
     if DEBUG_MODE:
         traceback.print_exc()
 
+# Import the RAG API handler and the chat context helpers once at startup
+# rather than on every request
+rag_api_handler = None
+rag_api_error = None
+rag_project_manager = None
+rag_project_manager_error = None
+rag_context_manager = None
+if RAG_ENABLED:
+    try:
+        from rag_support.api_extensions import api_handler as rag_api_handler
+    except ImportError as e:
+        print(f"Error importing RAG API handler: {e}")
+        if DEBUG_MODE:
+            traceback.print_exc()
+        rag_api_error = f"Failed to initialize API handler: {e}"
+    
+    try:
+        from rag_support.utils.project_manager import project_manager as rag_project_manager
+    except ImportError as e:
+        print(f"Error importing RAG project manager: {e}")
+        rag_project_manager_error = e
+    
+    try:
+        from rag_support.utils.context_manager import context_manager as rag_context_manager
+    except ImportError:
+        # Fall back to the legacy context handling in /api/chat
+        print("WARNING: Smart context manager not available, using legacy context handling")
+
+# Import the inference module once at startup rather than on every request
+# (SCRIPT_DIR is on sys.path from the setup above)
+try:
+    import minimal_inference_quiet as minimal_inference
+    inference_import_error = None
+except ImportError as e:
+    print(f"Could not import minimal_inference_quiet: {e}")
+    minimal_inference = None
+    inference_import_error = e
+
+# Introduces the document context added to the system prompt
+RAG_CONTEXT_PREFIX = "Use the following information to answer the user's question:\n\n"
+
 # Template rendering function
+@functools.lru_cache(maxsize=64)
+def _get_template(template_name):
+    """Look up a compiled template, cached by name"""
+    return template_env.get_template(template_name)
+
+@functools.lru_cache(maxsize=64)
+def _render_cached(template_name, kwargs_items):
+    """Render a template with hashable kwargs, cached by name and kwargs"""
+    return _get_template(template_name).render(dict(kwargs_items))
+
 def render_template(template_name, **kwargs):
     """Render a template with the given kwargs
     
@@ -160,9 +267,17 @@ def render_template(template_name, **kwargs):
         raise ImportError(error_msg)
     
     try:
-        # Try to load the template
-        template = template_env.get_template(template_name)
-        return template.render(**kwargs)
+        # In debug mode templates are re-read so edits show up immediately
+        if DEBUG_MODE:
+            return template_env.get_template(template_name).render(**kwargs)
+        
+        # Reuse the rendered output when the same template and kwargs repeat
+        try:
+            kwargs_items = frozenset(kwargs.items())
+        except TypeError:
+            # Unhashable kwargs - render without caching the output
+            return _get_template(template_name).render(**kwargs)
+        return _render_cached(template_name, kwargs_items)
     except jinja2.exceptions.TemplateNotFound:
         # Log error about missing template - this is a critical error
         error_msg = f"Critical Error: Template {template_name} not found"
@@ -175,6 +290,37 @@ def render_template(template_name, **kwargs):
             traceback.print_exc()
         raise
 
+_STYLE_BLOCK_RE = re.compile(r'(<style[^>]*>)(.*?)(</style>)', re.S | re.I)
+_CSS_COMMENT_RE = re.compile(r'/\*.*?\*/', re.S)
+_CSS_SPACE_RE = re.compile(r'\s+')
+_CSS_PUNCT_SPACE_RE = re.compile(r'\s*([{};])\s*')
+
+def _minify_css(css):
+    """Strip comments and redundant whitespace from a block of CSS"""
+    css = _CSS_COMMENT_RE.sub('', css)
+    css = _CSS_SPACE_RE.sub(' ', css)
+    return _CSS_PUNCT_SPACE_RE.sub(r'\1', css).strip()
+
+def _minify_styles(page):
+    """Minify the inline <style> blocks of a rendered page
+    
+    Only CSS is touched: inline scripts contain template literals whose
+    whitespace can be visible, so they are served as written.
+    """
+    return _STYLE_BLOCK_RE.sub(lambda m: m.group(1) + _minify_css(m.group(2)) + m.group(3), page)
+
+@functools.lru_cache(maxsize=1)
+def _get_index_page():
+    """Render the main page once and return it as (raw bytes, gzip bytes, ETag)
+    
+    The page only depends on RAG_ENABLED, so it is rendered, minified and
+    compressed a single time instead of on every page load.
+    """
+    page = render_template("layouts/main.html", rag_enabled=RAG_ENABLED)
+    body = _minify_styles(page).encode('utf-8')
+    etag = f'"{zlib.crc32(body):x}-{len(body):x}"'
+    return body, gzip.compress(body, compresslevel=9), etag
+
 # [DEPRECATED] - This fallback system is being phased out as part of HTML interface implementation
 # No fallbacks are allowed anymore - templates are required and errors must be transparent
 # This function is kept temporarily for reference only and will be removed in a future update
@@ -486,33 +632,57 @@ HTML_TEMPLATE = """
                 document.getElementById('modelList').innerHTML = 'Error loading models: ' + error.message;
             });
         
+        // Move chats saved by earlier versions to per-chat llm_chats/<id> keys
+        function migrateChatStorage() {
+            try {
+                const legacyChats = localStorage.getItem('llm_chats');
+                const legacyHistory = localStorage.getItem('llm_chat_history');
+                if (legacyChats === null && legacyHistory === null) return;
+        
+                // The llm_chats map held every chat; llm_chat_history held the
+                // current chat id and a copy of that chat
+                const chats = JSON.parse(legacyChats || '{}');
+                const history = JSON.parse(legacyHistory || '{}');
+                Object.assign(chats, history.chats || {});
+        
+                for (const id of Object.keys(chats)) {
+                    if (localStorage.getItem('llm_chats/' + id) === null) {
+                        localStorage.setItem('llm_chats/' + id, JSON.stringify(chats[id]));
+                    }
+                }
+                if (history.currentChatId && localStorage.getItem('llm_current_chat') === null) {
+                    localStorage.setItem('llm_current_chat', history.currentChatId);
+                }
+        
+                localStorage.removeItem('llm_chats');
+                localStorage.removeItem('llm_chat_history');
+            } catch (e) {
+                console.error('Error migrating chat history:', e);
+            }
+        }
+        
         // Load chat history from localStorage if available
         function loadChatHistory() {
-            const savedHistory = localStorage.getItem('llm_chat_history');
-            if (savedHistory) {
+            migrateChatStorage();
+        
+            const chatId = localStorage.getItem('llm_current_chat');
+            const savedChat = chatId && localStorage.getItem('llm_chats/' + chatId);
+            if (savedChat) {
                 try {
-                    const savedData = JSON.parse(savedHistory);
-                    if (savedData.currentChatId && savedData.chats && savedData.chats[savedData.currentChatId]) {
-                        currentChatId = savedData.currentChatId;
-                        chatHistory = savedData.chats[currentChatId] || [];
-                        renderChatHistory();
-                    }
+                    currentChatId = chatId;
+                    chatHistory = JSON.parse(savedChat) || [];
+                    renderChatHistory();
                 } catch (e) {
                     console.error('Error loading chat history:', e);
                 }
             }
         }
         
-        // Save chat history to localStorage
+        // Save chat history to localStorage, one key per chat
         function saveChatHistory() {
             try {
-                const allChats = JSON.parse(localStorage.getItem('llm_chats') || '{}');
-                allChats[currentChatId] = chatHistory;
-                localStorage.setItem('llm_chats', JSON.stringify(allChats));
-                localStorage.setItem('llm_chat_history', JSON.stringify({
-                    currentChatId,
-                    chats: { [currentChatId]: chatHistory }
-                }));
+                localStorage.setItem('llm_chats/' + currentChatId, JSON.stringify(chatHistory));
+                localStorage.setItem('llm_current_chat', currentChatId);
             } catch (e) {
                 console.error('Error saving chat history:', e);
             }
@@ -710,317 +880,646 @@ HTML_TEMPLATE = """
 </html>
 """
 
-def find_models():
-    """Find all model files in the directory structure"""
-    # Try to import the inference module
+_MODEL_SUFFIXES = frozenset({'.bin', '.gguf', '.safetensors'})
+
+def _subdirectories(directory):
+    """Return the subdirectories of directory as os.DirEntry objects"""
+    with os.scandir(directory) as entries:
+        return [entry for entry in entries if entry.is_dir()]
+
+def _model_files(directory):
+    """Return the model files in directory as os.DirEntry objects
+    
+    DirEntry caches the file type from the directory listing, so only the
+    size lookup of a matching file needs a stat() call.
+    """
+    with os.scandir(directory) as entries:
+        return [
+            entry for entry in entries
+            if os.path.splitext(entry.name)[1] in _MODEL_SUFFIXES and entry.is_file()
+        ]
+
+# Last find_models result and the directory modification times it was built from
+_models_cache = {"directories": None, "stamp": None, "models": None}
+_models_cache_lock = threading.Lock()
+
+def _models_root():
+    """Return the LLM-MODELS directory that _scan_models lists"""
+    if minimal_inference is not None:
+        return minimal_inference.BASE_DIR / "LLM-MODELS"
+    return BASE_DIR / "LLM-MODELS"
+
+def _model_directories(models_dir):
+    """Return the directories _scan_models reads under models_dir
+    
+    These are the LLM-MODELS, quantized and open-source directories, the
+    format, family and size directories below them, and nothing deeper, so
+    the files inside a model's own directory are never listed.
+    """
+    quantized_dir = os.path.join(models_dir, "quantized")
+    open_source_dir = os.path.join(models_dir, "open-source")
+    directories = [str(models_dir), quantized_dir, open_source_dir]
+    
     try:
-        # Make sure the scripts directory is in the path
-        scripts_dir = str(BASE_DIR / "scripts")
-        if scripts_dir not in sys.path:
-            sys.path.append(scripts_dir)
-            
-        import minimal_inference_quiet as minimal_inference
+        directories.extend(entry.path for entry in _subdirectories(quantized_dir))
+    except FileNotFoundError:
+        pass
+    try:
+        family_dirs = _subdirectories(open_source_dir)
+    except FileNotFoundError:
+        family_dirs = []
+    for family_dir in family_dirs:
+        directories.append(family_dir.path)
+        try:
+            directories.extend(entry.path for entry in _subdirectories(family_dir.path))
+        except FileNotFoundError:
+            pass
+    return directories
+
+def _directory_stamp(directories):
+    """Return the modification times of directories (None for a missing one)"""
+    stamp = []
+    for directory in directories:
+        try:
+            stamp.append(os.stat(directory).st_mtime_ns)
+        except FileNotFoundError:
+            stamp.append(None)
+    return tuple(stamp)
+
+def find_models():
+    """Find all model files in the directory structure
+    
+    The result is cached until a directory the scan reads changes. Adding,
+    removing or renaming a model file updates its directory's mtime, so a
+    cache hit only costs one stat() per directory.
+    """
+    with _models_cache_lock:
+        directories = _models_cache["directories"]
+        if directories is not None and _directory_stamp(directories) == _models_cache["stamp"]:
+            return _models_cache["models"]
+        
+        # Record the directory times before scanning, so a change made during
+        # the scan triggers another scan on the next call
+        directories = _model_directories(_models_root())
+        stamp = _directory_stamp(directories)
         
-        # Use the module's model listing if available
+        models = _scan_models()
+        _models_cache.update(directories=directories, stamp=stamp, models=models)
+        return models
+
+# The models list last served by /api/models as (models, JSON bytes, gzip bytes, ETag)
+_models_body = (None, None, None, None)
+
+def _get_models_body():
+    """Return the /api/models response as (JSON bytes, gzip bytes, ETag)
+    
+    The encoded bodies are rebuilt only when find_models returns a new list.
+    """
+    global _models_body
+    models = find_models()
+    cached_models, body, gzipped, etag = _models_body
+    if models is not cached_models:
+        body = _json_dumps({"models": models})
+        gzipped = gzip.compress(body, compresslevel=6)
+        etag = f'"{zlib.crc32(body):x}-{len(body):x}"'
+        _models_body = (models, body, gzipped, etag)
+    return body, gzipped, etag
+
+def _scan_models():
+    """Scan the directory structure for model files"""
+    # Use the inference module's model listing if available
+    if minimal_inference is not None:
         models = minimal_inference.list_models()
-        print(f"Found {len(models)} models")
+        logger.debug("Found %d models", len(models))
         return models
-    except ImportError as e:
-        print("Could not import minimal_inference module, falling back to basic model search")
-        models = []
-        
-        # Search in quantized directory
-        quantized_dir = BASE_DIR / "LLM-MODELS" / "quantized"
-        if quantized_dir.exists():
-            for format_dir in quantized_dir.glob("*"):
-                if format_dir.is_dir():
-                    for model_file in format_dir.glob("*"):
-                        if model_file.is_file() and model_file.suffix in ['.bin', '.gguf', '.safetensors']:
-                            models.append({
-                                "path": str(model_file.relative_to(BASE_DIR)),
-                                "type": "quantized",
-                                "size_mb": round(model_file.stat().st_size / (1024 * 1024), 2)
-                            })
+    
+    print("Could not import minimal_inference module, falling back to basic model search")
+    models = []
+    
+    # Search in quantized directory
+    quantized_dir = BASE_DIR / "LLM-MODELS" / "quantized"
+    if quantized_dir.exists():
+        for format_dir in _subdirectories(quantized_dir):
+            for model_file in _model_files(format_dir.path):
+                models.append({
+                    "path": os.path.join("LLM-MODELS", "quantized", format_dir.name, model_file.name),
+                    "type": "quantized",
+                    "size_mb": round(model_file.stat().st_size / (1024 * 1024), 2)
+                })
+    
+    # Search in open-source directory
+    open_source_dir = BASE_DIR / "LLM-MODELS" / "open-source"
+    if open_source_dir.exists():
+        for family_dir in _subdirectories(open_source_dir):
+            for size_dir in _subdirectories(family_dir.path):
+                for model_file in _model_files(size_dir.path):
+                    models.append({
+                        "path": os.path.join("LLM-MODELS", "open-source", family_dir.name, size_dir.name, model_file.name),
+                        "type": "open-source",
+                        "size_mb": round(model_file.stat().st_size / (1024 * 1024), 2)
+                    })
+    
+    return models
+
+# Project ID in a referring page URL such as http://host/projects/<id>/...
+# (the scheme and host are skipped, and the query and fragment are ignored)
+_REFERER_PROJECT_RE = re.compile(r'(?:[A-Za-z][A-Za-z0-9+.-]*://[^/?#]*)?(?:/[^/?#]*)*?/projects/([^/?#]+)')
+
+# Conservative context token limit to prevent model overload
+def _build_rag_context(project_manager, project_id, context_docs, max_context_tokens=800):
+    """Assemble the legacy RAG context for the given documents.
+    
+    Documents are added smallest first until the token budget is used up;
+    if even the smallest does not fit, it is truncated to the budget.
+    Documents are ordered by file size, so the ones past the budget are
+    never read. The file size includes the frontmatter, so documents whose
+    content is close in size may be ordered differently than by content.
+    
+    Returns a tuple of (context_content, context_docs_info, current_tokens).
+    """
+    # Sort the documents smallest first to fit more of them
+    sized_docs = []
+    for doc_id in context_docs:
+        size = project_manager.get_document_size(project_id, doc_id)
+        if size is not None:
+            sized_docs.append((size, doc_id))
+    sized_docs.sort(key=lambda doc: doc[0])
+    
+    # Add documents until we hit the token limit, collecting
+    # the context fragments to join once at the end
+    context_parts = []
+    context_docs_info = []
+    current_tokens = 0
+    for _, doc_id in sized_docs:
+        doc = project_manager.get_document(project_id, doc_id)
+        if not doc:
+            continue
+        doc_title = doc.get('title', 'Document')
+        doc_content = doc.get('content', '')
+        # Estimate tokens (roughly 4 chars per token for English text)
+        doc_tokens = len(doc_content) // 4
         
-        # Search in open-source directory
-        open_source_dir = BASE_DIR / "LLM-MODELS" / "open-source"
-        if open_source_dir.exists():
-            for family_dir in open_source_dir.glob("*"):
-                if family_dir.is_dir():
-                    for size_dir in family_dir.glob("*"):
-                        if size_dir.is_dir():
-                            for model_file in size_dir.glob("*"):
-                                if model_file.is_file() and model_file.suffix in ['.bin', '.gguf', '.safetensors']:
-                                    models.append({
-                                        "path": str(model_file.relative_to(BASE_DIR)),
-                                        "type": "open-source",
-                                        "size_mb": round(model_file.stat().st_size / (1024 * 1024), 2)
-                                    })
+        # Check if adding this document would exceed our token limit
+        if current_tokens + doc_tokens > max_context_tokens:
+            # If this is the first document, we need to truncate it
+            if not context_docs_info:
+                # Take as much as we can from this document
+                max_chars = max_context_tokens * 4
+                truncated_content = doc_content[:max_chars] + "...[truncated]"
+                truncated_tokens = len(truncated_content) // 4
+                context_parts.append(f"## {doc_title}\n\n{truncated_content}\n\n")
+                context_docs_info.append({
+                    'id': doc_id,
+                    'title': doc_title,
+                    'tokens': truncated_tokens,
+                    'truncated': True
+                })
+                current_tokens += truncated_tokens
+            break
         
-        return models
+        # Add this document to our context
+        context_parts.append(f"## {doc_title}\n\n{doc_content}\n\n")
+        context_docs_info.append({
+            'id': doc_id,
+            'title': doc_title,
+            'tokens': doc_tokens,
+            'truncated': False
+        })
+        current_tokens += doc_tokens
+    
+    return "".join(context_parts), context_docs_info, current_tokens
+
+# Content types of the static assets, by file extension
+_ASSET_TYPES = {
+    '.css': 'text/css',
+    '.js': 'application/javascript',
+    '.png': 'image/png',
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.svg': 'image/svg+xml',
+}
+
+# Text content types worth compressing; PNG and JPEG are already compressed
+_COMPRESSIBLE_TYPES = frozenset({'text/css', 'application/javascript', 'image/svg+xml', 'text/plain'})
+
+# Assets larger than this are sent from disk with sendfile instead of being
+# held in memory
+_ASSET_MEMORY_LIMIT = 64 * 1024
+
+def _find_asset(file_path):
+    """Return the file for an asset path under TEMPLATES_DIR, or None"""
+    full_path = TEMPLATES_DIR / file_path
+    if full_path.is_file():
+        return full_path
+    
+    # Try alternate path - some files may be directly under the assets folder
+    extension = os.path.splitext(file_path)[1]
+    if extension in ('.css', '.js'):
+        alternate_path = ASSETS_DIR / extension[1:] / Path(file_path).name
+        if alternate_path.is_file():
+            return alternate_path
+    
+    return None
+
+@functools.lru_cache(maxsize=256)
+def _get_asset(file_path):
+    """Look up a static asset once and return (path, content type, cached), or None
+    
+    Assets do not change while the server runs, so each one is found, read
+    and compressed a single time and then served from memory. cached is
+    (body, gzip body, ETag), where the gzip body is None for types that do
+    not compress. It is None for assets over _ASSET_MEMORY_LIMIT, which are
+    sent from disk instead.
+    """
+    full_path = _find_asset(file_path)
+    if full_path is None:
+        logger.debug("Asset not found: %s", file_path)
+        return None
+    
+    content_type = _ASSET_TYPES.get(os.path.splitext(file_path)[1], 'text/plain')
+    if full_path.stat().st_size > _ASSET_MEMORY_LIMIT:
+        return full_path, content_type, None
+    
+    body = full_path.read_bytes()
+    gzipped = gzip.compress(body, compresslevel=9) if content_type in _COMPRESSIBLE_TYPES else None
+    etag = f'"{zlib.crc32(body):x}-{len(body):x}"'
+    return full_path, content_type, (body, gzipped, etag)
+
+def _etag_matches(etag, if_none_match):
+    """Return True if an If-None-Match header value lists etag, or is "*"
+    
+    If-None-Match uses weak comparison, so a W/ prefix on a listed tag is
+    ignored.
+    """
+    if not if_none_match:
+        return False
+    for tag in if_none_match.split(','):
+        tag = tag.strip()
+        if tag == '*' or tag.removeprefix('W/') == etag:
+            return True
+    return False
+
+def _log_context_docs(context_docs_info):
+    """Log the documents added to the chat context (debug level only)"""
+    if not logger.isEnabledFor(logging.DEBUG):
+        return
+    
+    total_tokens = sum(doc.get('tokens', 0) for doc in context_docs_info)
+    logger.debug("Added %d documents to context. Total tokens: %d", len(context_docs_info), total_tokens)
+    for doc in context_docs_info:
+        logger.debug("- %s: %s tokens%s", doc['title'], doc['tokens'], ' (truncated)' if doc.get('truncated') else '')
+
+# Requests are served on separate threads, but loaded models are not safe to
+# run from several threads at once, so generation is serialized
+generation_lock = threading.Lock()
 
 class RequestHandler(http.server.SimpleHTTPRequestHandler):
     """Handler for the HTTP requests"""
     
+    # Keep connections alive so the browser reuses one TCP connection for the
+    # page, its assets and API calls. Every response must send Content-Length.
+    protocol_version = "HTTP/1.1"
+    
+    # Buffer writes so the status line, headers and body go out in one send;
+    # handle_one_request flushes the buffer after each request
+    wbufsize = 64 * 1024
+    
+    # Set TCP_NODELAY on each connection so small responses and streamed
+    # chat tokens are sent immediately instead of waiting on Nagle's algorithm
+    disable_nagle_algorithm = True
+    
+    # Module flags bound at class level for the per-request checks
+    _RAG_ENABLED = RAG_ENABLED
+    _DEBUG_MODE = DEBUG_MODE
+    
+    # RAG API handler, imported once at startup
+    _api_handler = rag_api_handler
+    
+    def _send_json(self, status_code, data):
+        """Send a JSON response with an explicit Content-Length"""
+        body = _json_dumps(data)
+        self.send_response(status_code)
+        self.send_header('Content-type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
     def log_message(self, format, *args):
         """Override to provide minimal logging"""
         # Mostly silence logging except for errors
-        if len(args) > 2 and not args[1].startswith('20'):  # Not a 2xx status code
+        if len(args) > 2 and not args[1].startswith(('20', '304')):  # Not a 2xx or Not Modified status code
             super().log_message(format, *args)
     
+    def _read_json_body(self):
+        """Read and parse the JSON request body
+        
+        The raw bytes are parsed directly (JSON is UTF-8 by definition), so no
+        intermediate decoded copy of the body is made.
+        """
+        content_length = int(self.headers['Content-Length'])
+        return _json_loads(self.rfile.read(content_length))
+    
+    def _send_encoded(self, content_type, body, gzipped, etag=None):
+        """Send a precomputed body, using its gzip form if the client accepts it
+        
+        gzipped may be None when there is no compressed form. With an ETag, a
+        client that already holds the current body gets an empty 304 response
+        instead.
+        """
+        if etag is not None and self._send_not_modified(etag, vary=gzipped is not None):
+            return
+        
+        if gzipped is not None and 'gzip' in self.headers.get('Accept-Encoding', ''):
+            body = gzipped
+        
+        self.send_response(200)
+        self.send_header('Content-type', content_type)
+        if body is gzipped:
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(body)))
+        if gzipped is not None:
+            self.send_header('Vary', 'Accept-Encoding')
+        if etag is not None:
+            self.send_header('ETag', etag)
+            self.send_header('Cache-Control', 'no-cache')  # Revalidate with the ETag
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def _send_not_modified(self, etag, vary=False):
+        """Send an empty 304 response if the client already holds etag
+        
+        Returns True if the response was sent. The 304 repeats the ETag and
+        caching headers of the full response, including Vary when that
+        response depends on Accept-Encoding.
+        """
+        if not _etag_matches(etag, self.headers.get('If-None-Match')):
+            return False
+        
+        self.send_response(304)
+        if vary:
+            self.send_header('Vary', 'Accept-Encoding')
+        self.send_header('ETag', etag)
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        return True
+    
+    def _stream_chat(self, model_path, gen_kwargs, context_docs):
+        """Stream a chat reply to the client as Server-Sent Events
+        
+        Each generated chunk is sent and flushed as a data event with a "token"
+        field. A final event carries either the stats ("done") or an "error".
+        The length is not known up front, so the connection is closed after.
+        """
+        self.send_response(200)
+        self.send_header('Content-type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.close_connection = True
+        
+        start_time = time.time()
+        chunks_generated = 0
+        try:
+            # Close the generator while the lock is held, so a generation the
+            # client abandoned is stopped before the next request runs
+            with generation_lock, contextlib.closing(
+                    minimal_inference.generate_stream(model_path, **gen_kwargs)) as tokens:
+                for token in tokens:
+                    chunks_generated += 1
+                    self.wfile.write(b"data: " + _json_dumps({"token": token}) + b"\n\n")
+                    self.wfile.flush()
+            
+            event = {
+                "done": True,
+                "model": model_path,
+                "time_taken": round(time.time() - start_time, 2),
+                # One chunk per token for llama.cpp; text pieces for transformers
+                "tokens_generated": chunks_generated
+            }
+            if context_docs:
+                event["context_used"] = True
+                event["context_count"] = len(context_docs)
+        except (BrokenPipeError, ConnectionResetError):
+            # The client went away - nothing left to send
+            return
+        except Exception as e:
+            event = ErrorHandler.handle_api_error(
+                e,
+                context=f"Streaming response for model {model_path}",
+                include_traceback=self._DEBUG_MODE
+            )
+            event["model"] = model_path
+        
+        self.wfile.write(b"data: " + _json_dumps(event) + b"\n\n")
+    
     def do_GET(self):
-        """Handle GET requests"""
-        parsed_path = urllib.parse.urlparse(self.path)
+        """Handle GET requests
+        
+        Exact paths are looked up in _GET_ROUTES; the RAG API and static
+        assets are matched by prefix.
+        """
+        # Only the path and query string are used, so split them directly
+        # rather than running a full urlparse
+        path, _, query = self.path.partition('?')
         
         # Handle RAG API requests if enabled
-        if RAG_ENABLED and parsed_path.path.startswith('/api/projects'):
-            try:
-                # Import and initialize the RAG API handler
-                try:
-                    # Ensure the rag_support package is properly loaded
-                    import importlib
-                    
-                    # Make sure the rag_support package is in the path
-                    if str(BASE_DIR) not in sys.path:
-                        sys.path.insert(0, str(BASE_DIR))
-                    
-                    # Reload the modules to ensure latest changes are loaded
-                    if 'rag_support' in sys.modules:
-                        importlib.reload(sys.modules['rag_support'])
-                    
-                    # Import the package and initialize directories
-                    import rag_support
-                    rag_support.init_directories()
-                    
-                    # Import API handler
-                    importlib.reload(rag_support.api_extensions)
-                    from rag_support.api_extensions import api_handler
-                    
-                    print(f"Successfully imported and initialized RAG API handler")
-                except Exception as e:
-                    print(f"Error importing RAG API handler: {e}")
-                    if DEBUG_MODE:
-                        import traceback
-                        traceback.print_exc()
-                    self.send_error(500, explain=f"Failed to initialize API handler: {str(e)}")
-                    return
-                
-                # Parse query parameters
-                query_params = {}
-                if parsed_path.query:
-                    query_params = {k: v[0] for k, v in urllib.parse.parse_qs(parsed_path.query).items()}
-                
-                # Handle the request
-                status_code, response_data = api_handler.handle_request(
-                    parsed_path.path, 
-                    'GET', 
-                    query_params=query_params
-                )
-                
-                self.send_response(status_code)
-                self.send_header('Content-type', 'application/json')
-                self.end_headers()
-                self.wfile.write(json.dumps(response_data).encode('utf-8'))
-                return
-            except ImportError as e:
-                ErrorHandler.handle_request_error(
-                    self, 500, e, 
-                    context=f"RAG API GET (ImportError): {parsed_path.path}"
-                )
-                return
-            except Exception as e:
-                ErrorHandler.handle_request_error(
-                    self, 500, e, 
-                    context=f"RAG API GET: {parsed_path.path}"
-                )
-                return
+        if self._RAG_ENABLED and path.startswith('/api/projects'):
+            self._handle_rag_get(path, query)
+            return
         
-        # Standard request handling
-        if parsed_path.path == '/' or parsed_path.path == '/index.html':
-            try:
-                # Render template - no fallback allowed
-                html = render_template("layouts/main.html", rag_enabled=RAG_ENABLED)
-                
-                self.send_response(200)
-                self.send_header('Content-type', 'text/html')
-                self.end_headers()
-                self.wfile.write(html.encode('utf-8'))
-                
-                print("Rendered main template successfully")
-            except Exception as e:
-                # Create a basic error page for template rendering failures
-                error_context = "Rendering main page template"
-                error_message = ErrorHandler.format_error(e, include_traceback=DEBUG_MODE)
-                ErrorHandler.log_error(e, error_context, include_traceback=DEBUG_MODE)
-                
-                # Send a proper error response with a basic HTML error template
-                self.send_response(500)
-                self.send_header('Content-type', 'text/html')
-                self.end_headers()
-                
-                # Import html module here to avoid UnboundLocalError
-                import html as html_module
-                
-                error_html = f"""
-                <!DOCTYPE html>
-                <html>
-                <head><title>Template Error</title></head>
-                <body style="font-family: system-ui, sans-serif; margin: 2rem; line-height: 1.6;">
-                    <h1>Template Rendering Error</h1>
-                    <p>There was an error rendering the template:</p>
-                    <pre style="background: #f5f5f5; padding: 1rem; border-radius: 4px; overflow: auto;">{html_module.escape(error_message)}</pre>
-                    <p>Please make sure all template files are available and Jinja2 is installed.</p>
-                    <p><a href="javascript:location.reload()">Reload page</a></p>
-                </body>
-                </html>
-                """
-                self.wfile.write(error_html.encode('utf-8'))
-        elif parsed_path.path == '/api/models':
-            self.send_response(200)
-            self.send_header('Content-type', 'application/json')
-            self.end_headers()
+        handler = self._GET_ROUTES.get(path)
+        if handler is not None:
+            handler(self, path)
+        elif path.startswith('/assets/'):
+            self._serve_asset(path)
+        else:
+            self.send_error(404, "File not found")
+    
+    def _handle_rag_get(self, path, query):
+        """Pass a GET request on to the RAG API handler"""
+        try:
+            api_handler = self._api_handler
+            if api_handler is None:
+                self.send_error(500, explain=rag_api_error)
+                return
             
-            models = find_models()
-            self.wfile.write(json.dumps({"models": models}).encode('utf-8'))
-        # Handle static assets
-        elif parsed_path.path.startswith('/assets/'):
-            # Extract the file path from the URL
-            file_path = parsed_path.path[1:]  # Remove leading slash
-            full_path = TEMPLATES_DIR / file_path
+            # Parse query parameters, keeping the first value of repeated keys
+            query_params = {}
+            if query:
+                for key, value in urllib.parse.parse_qsl(query):
+                    query_params.setdefault(key, value)
             
-            print(f"Trying to serve static asset: {file_path}")
-            print(f"Full path: {full_path}")
+            # Handle the request
+            status_code, response_data = api_handler.handle_request(
+                path, 
+                'GET', 
+                query_params=query_params
+            )
             
-            # Check if the file exists
-            if not full_path.is_file():
-                print(f"Asset not found: {full_path}")
-                # Try alternate path - some files may be directly under the assets folder
-                if file_path.endswith('.css'):
-                    alternate_path = ASSETS_DIR / "css" / Path(file_path).name
-                    if alternate_path.is_file():
-                        full_path = alternate_path
-                    else:
-                        print(f"CSS not found at alternate location: {alternate_path}")
-                elif file_path.endswith('.js'):
-                    alternate_path = ASSETS_DIR / "js" / Path(file_path).name
-                    if alternate_path.is_file():
-                        full_path = alternate_path
-                    else:
-                        print(f"JS not found at alternate location: {alternate_path}")
-                        
-            # Final check if the file exists
-            if not full_path.is_file():
-                self.send_error(404, f"Asset not found: {parsed_path.path}")
+            self._send_json(status_code, response_data)
+        except ImportError as e:
+            ErrorHandler.handle_request_error(
+                self, 500, e, 
+                context=f"RAG API GET (ImportError): {path}"
+            )
+        except Exception as e:
+            ErrorHandler.handle_request_error(
+                self, 500, e, 
+                context=f"RAG API GET: {path}"
+            )
+    
+    def _serve_index(self, path):
+        """Serve the main page"""
+        try:
+            # Render template - no fallback allowed. Debug mode skips the
+            # cache so template edits show up on reload
+            if self._DEBUG_MODE:
+                page = _get_index_page.__wrapped__()
+            else:
+                page = _get_index_page()
+            
+            self._send_encoded('text/html; charset=utf-8', *page)
+            
+            logger.debug("Rendered main template successfully")
+        except Exception as e:
+            # Create a basic error page for template rendering failures
+            error_context = "Rendering main page template"
+            error_message = ErrorHandler.format_error(e, include_traceback=self._DEBUG_MODE)
+            ErrorHandler.log_error(e, error_context, include_traceback=self._DEBUG_MODE)
+            
+            error_html = f"""
+            <!DOCTYPE html>
+            <html>
+            <head><title>Template Error</title></head>
+            <body style="font-family: system-ui, sans-serif; margin: 2rem; line-height: 1.6;">
+                <h1>Template Rendering Error</h1>
+                <p>There was an error rendering the template:</p>
+                <pre style="background: #f5f5f5; padding: 1rem; border-radius: 4px; overflow: auto;">{html.escape(error_message)}</pre>
+                <p>Please make sure all template files are available and Jinja2 is installed.</p>
+                <p><a href="javascript:location.reload()">Reload page</a></p>
+            </body>
+            </html>
+            """
+            
+            # Send a proper error response with a basic HTML error template
+            body = error_html.encode('utf-8')
+            self.send_response(500)
+            self.send_header('Content-type', 'text/html')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+    
+    def _serve_models(self, path):
+        """Serve the list of available models"""
+        self._send_encoded('application/json', *_get_models_body())
+    
+    def _serve_asset(self, path):
+        """Serve a static asset from the templates directory"""
+        file_path = path[1:]  # Remove leading slash
+        
+        try:
+            # Debug mode skips the cache so asset edits show up on reload
+            if self._DEBUG_MODE:
+                asset = _get_asset.__wrapped__(file_path)
+            else:
+                asset = _get_asset(file_path)
+        except Exception as e:
+            error_context = f"Serving static asset {file_path}"
+            ErrorHandler.log_error(e, error_context, include_traceback=self._DEBUG_MODE)
+            self.send_error(500, f"Error serving asset: {str(e)}")
+            return
+        
+        if asset is None:
+            self.send_error(404, f"Asset not found: {path}")
+            return
+        
+        full_path, content_type, cached = asset
+        if cached is not None:
+            self._send_encoded(content_type, *cached)
+            return
+        
+        try:
+            self._send_file(full_path, content_type)
+        except OSError as e:
+            error_context = f"Serving static asset {file_path}"
+            ErrorHandler.log_error(e, error_context, include_traceback=self._DEBUG_MODE)
+            self.send_error(500, f"Error serving asset: {str(e)}")
+    
+    def _send_file(self, full_path, content_type):
+        """Send a file from disk, letting the kernel copy it to the socket"""
+        with open(full_path, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+            
+            # Let the browser reuse its cached copy if the file is unchanged
+            if self._send_not_modified(etag):
                 return
-                
-            # Determine the MIME type
-            content_type = 'text/plain'
-            if file_path.endswith('.css'):
-                content_type = 'text/css'
-            elif file_path.endswith('.js'):
-                content_type = 'application/javascript'
-            elif file_path.endswith('.png'):
-                content_type = 'image/png'
-            elif file_path.endswith('.jpg') or file_path.endswith('.jpeg'):
-                content_type = 'image/jpeg'
-            elif file_path.endswith('.svg'):
-                content_type = 'image/svg+xml'
-                
-            # Send the file content
-            try:
-                with open(full_path, 'rb') as f:
-                    content = f.read()
-                    
-                self.send_response(200)
-                self.send_header('Content-type', content_type)
-                self.send_header('Content-Length', str(len(content)))
-                self.end_headers()
-                self.wfile.write(content)
-            except Exception as e:
-                error_context = f"Serving static asset {file_path}"
-                ErrorHandler.log_error(e, error_context, include_traceback=DEBUG_MODE)
-                self.send_error(500, f"Error serving asset: {str(e)}")
-        else:
-            self.send_error(404, "File not found")
+            
+            self.send_response(200)
+            self.send_header('Content-type', content_type)
+            self.send_header('Content-Length', str(stat.st_size))
+            self.send_header('ETag', etag)
+            self.send_header('Cache-Control', 'no-cache')  # Revalidate with the ETag
+            self.end_headers()
+            
+            # Flush the buffered headers, then send the file with sendfile
+            # (socket.sendfile falls back to plain sends where unsupported)
+            self.wfile.flush()
+            self.connection.sendfile(f)
+    
+    # Exact-match GET routes, dispatched with a single dict lookup
+    _GET_ROUTES = {
+        '/': _serve_index,
+        '/index.html': _serve_index,
+        '/api/models': _serve_models,
+    }
     
     def do_POST(self):
         """Handle POST requests"""
-        parsed_path = urllib.parse.urlparse(self.path)
+        path = self.path.partition('?')[0]
         
         # Handle RAG API requests if enabled
-        if RAG_ENABLED and (parsed_path.path.startswith('/api/projects') or parsed_path.path.startswith('/api/tokens')):
+        if self._RAG_ENABLED and path.startswith(('/api/projects', '/api/tokens')):
             try:
-                # Import and initialize the RAG API handler
-                try:
-                    # Ensure the rag_support package is properly loaded
-                    import importlib
-                    
-                    # Make sure the rag_support package is in the path
-                    if str(BASE_DIR) not in sys.path:
-                        sys.path.insert(0, str(BASE_DIR))
-                    
-                    # Reload the modules to ensure latest changes are loaded
-                    if 'rag_support' in sys.modules:
-                        importlib.reload(sys.modules['rag_support'])
-                    
-                    # Import the package and initialize directories
-                    import rag_support
-                    rag_support.init_directories()
-                    
-                    # Import API handler
-                    importlib.reload(rag_support.api_extensions)
-                    from rag_support.api_extensions import api_handler
-                    
-                    print(f"Successfully imported and initialized RAG API handler")
-                except Exception as e:
-                    print(f"Error importing RAG API handler: {e}")
-                    if DEBUG_MODE:
-                        import traceback
-                        traceback.print_exc()
-                    self.send_error(500, explain=f"Failed to initialize API handler: {str(e)}")
+                api_handler = self._api_handler
+                if api_handler is None:
+                    self.send_error(500, explain=rag_api_error)
                     return
                 
                 # Read POST data
-                content_length = int(self.headers['Content-Length'])
-                post_data = self.rfile.read(content_length)
-                request_data = json.loads(post_data.decode('utf-8'))
+                request_data = self._read_json_body()
                 
                 # Handle the request
                 status_code, response_data = api_handler.handle_request(
-                    parsed_path.path, 
+                    path, 
                     'POST', 
                     body=request_data
                 )
                 
-                self.send_response(status_code)
-                self.send_header('Content-type', 'application/json')
-                self.end_headers()
-                self.wfile.write(json.dumps(response_data).encode('utf-8'))
+                self._send_json(status_code, response_data)
                 return
             except ImportError as e:
                 ErrorHandler.handle_request_error(
                     self, 500, e, 
-                    context=f"RAG API POST (ImportError): {parsed_path.path}"
+                    context=f"RAG API POST (ImportError): {path}"
                 )
                 return
             except json.JSONDecodeError as e:
                 ErrorHandler.handle_request_error(
                     self, 400, e, 
-                    context=f"RAG API POST (Invalid JSON): {parsed_path.path}"
+                    context=f"RAG API POST (Invalid JSON): {path}"
                 )
                 return
             except Exception as e:
                 ErrorHandler.handle_request_error(
                     self, 500, e, 
-                    context=f"RAG API POST: {parsed_path.path}"
+                    context=f"RAG API POST: {path}"
                 )
                 return
         
         # Standard chat API handling
-        if parsed_path.path == '/api/chat':
-            content_length = int(self.headers['Content-Length'])
-            post_data = self.rfile.read(content_length)
-            request_data = json.loads(post_data.decode('utf-8'))
+        if path == '/api/chat':
+            request_data = self._read_json_body()
             
             model_path = request_data.get('model', '')
             message = request_data.get('message', '')
@@ -1038,35 +1537,28 @@ class RequestHandler(http.server.SimpleHTTPRequestHandler):
             context_docs_info = []
             
             # If we have context docs and RAG is enabled, load the document content using smart context manager
-            if RAG_ENABLED and context_docs:
+            if self._RAG_ENABLED and context_docs:
                 try:
-                    # Import the smart context manager and project manager
-                    from rag_support.utils import project_manager
-                    
-                    try:
-                        from rag_support.utils.context_manager import context_manager
-                    except ImportError:
-                        # Fallback to old method if context_manager isn't available
-                        print("WARNING: Smart context manager not available, using legacy context handling")
-                        context_manager = None
+                    # Use the smart context manager and project manager
+                    # imported at startup
+                    if rag_project_manager is None:
+                        raise rag_project_manager_error
+                    project_manager = rag_project_manager
+                    context_manager = rag_context_manager
                     
                     # Find the project ID from the context docs or headers
                     project_id = request_data.get('project_id')
                     
                     # If we don't have a project ID, try to get it from referer
-                    if not project_id:
-                        referer = self.headers.get('Referer', '')
-                        referer_parts = urllib.parse.urlparse(referer).path.split('/')
-                        for i, part in enumerate(referer_parts):
-                            if part == 'projects' and i + 1 < len(referer_parts):
-                                project_id = referer_parts[i + 1]
-                                break
+                    referer = None if project_id else self.headers.get('Referer')
+                    if referer:
+                        match = _REFERER_PROJECT_RE.match(referer)
+                        if match:
+                            project_id = match.group(1)
                     
                     # If we still don't have a project ID, use the first available project
                     if not project_id:
-                        projects = project_manager.get_projects()
-                        if projects:
-                            project_id = projects[0]['id']
+                        project_id = project_manager.first_project_id()
                     
                     # Load documents if we have a project ID
                     if project_id:
@@ -1087,120 +1579,65 @@ class RequestHandler(http.server.SimpleHTTPRequestHandler):
                             # Update the system message
                             system_message = system_message_with_context
                             
-                            # Log what documents were included
-                            total_tokens = sum(doc.get('tokens', 0) for doc in context_docs_info)
-                            print(f"Added {len(context_docs_info)} documents to context. Total tokens: {total_tokens}")
-                            for doc in context_docs_info:
-                                print(f"- {doc['title']}: {doc['tokens']} tokens {'(truncated)' if doc.get('truncated', False) else ''}")
+                            _log_context_docs(context_docs_info)
                         else:
                             # Legacy context handling (simplified and safer)
-                            all_docs = []
-                            # Helper function to estimate token count
-                            def estimate_tokens(text):
-                                # Roughly 4 chars per token for English text
-                                return len(text) // 4
-                                
-                            # Set a conservative max context token limit
-                            max_context_tokens = 800  # Conservative value to prevent model overload
-                            
-                            # First pass: load all documents and calculate token counts
-                            for doc_id in context_docs:
-                                doc = project_manager.get_document(project_id, doc_id)
-                                if doc:
-                                    doc_content = doc.get('content', '')
-                                    doc_title = doc.get('title', 'Document')
-                                    doc_tokens = estimate_tokens(doc_content)
-                                    all_docs.append({
-                                        'id': doc_id,
-                                        'title': doc_title,
-                                        'content': doc_content,
-                                        'tokens': doc_tokens
-                                    })
-                            
-                            # Sort by token count (smallest first to fit more documents)
-                            all_docs.sort(key=lambda x: x['tokens'])
-                            
-                            # Second pass: add documents until we hit the token limit
-                            current_tokens = 0
-                            for doc in all_docs:
-                                # Check if adding this document would exceed our token limit
-                                if current_tokens + doc['tokens'] > max_context_tokens:
-                                    # If this is the first document, we need to truncate it
-                                    if len(context_docs_info) == 0:
-                                        # Take as much as we can from this document
-                                        max_chars = max_context_tokens * 4
-                                        truncated_content = doc['content'][:max_chars] + "...[truncated]"
-                                        context_content += f"## {doc['title']}\n\n{truncated_content}\n\n"
-                                        context_docs_info.append({
-                                            'id': doc['id'],
-                                            'title': doc['title'],
-                                            'tokens': estimate_tokens(truncated_content),
-                                            'truncated': True
-                                        })
-                                        current_tokens += estimate_tokens(truncated_content)
-                                    break
-                                
-                                # Add this document to our context
-                                context_content += f"## {doc['title']}\n\n{doc['content']}\n\n"
-                                context_docs_info.append({
-                                    'id': doc['id'],
-                                    'title': doc['title'],
-                                    'tokens': doc['tokens'],
-                                    'truncated': False
-                                })
-                                current_tokens += doc['tokens']
+                            context_content, context_docs_info, _ = _build_rag_context(
+                                project_manager, project_id, context_docs
+                            )
                             
                             # Add context to system message
                             if context_content:
                                 if system_message:
-                                    system_message += "\n\n"
-                                system_message += "Use the following information to answer the user's question:\n\n" + context_content
+                                    system_message = f"{system_message}\n\n{RAG_CONTEXT_PREFIX}{context_content}"
+                                else:
+                                    system_message = f"{RAG_CONTEXT_PREFIX}{context_content}"
                                 
-                                print(f"Added {len(context_docs_info)} documents to context. Total tokens: {current_tokens}")
-                                for doc in context_docs_info:
-                                    print(f"- {doc['title']}: {doc['tokens']} tokens {'(truncated)' if doc.get('truncated') else ''}")
+                                _log_context_docs(context_docs_info)
                 except ImportError as e:
-                    print(f"Error loading context: {e}")
-                    traceback.print_exc()
+                    ErrorHandler.log_error(e, "Loading RAG context", include_traceback=self._DEBUG_MODE)
                 except Exception as e:
-                    print(f"Error processing context: {e}")
-                    traceback.print_exc()
+                    ErrorHandler.log_error(e, "Processing RAG context", include_traceback=self._DEBUG_MODE)
             
             # Try to use the inference module
             try:
-                # Make sure the scripts directory is in the path
-                scripts_dir = str(BASE_DIR / "scripts")
-                if scripts_dir not in sys.path:
-                    sys.path.append(scripts_dir)
+                if minimal_inference is None:
+                    raise inference_import_error
                 
-                import minimal_inference_quiet as minimal_inference
-                print(f"Successfully imported minimal_inference_quiet from {minimal_inference.__file__}")
+                gen_kwargs = {
+                    "system_prompt": system_message,
+                    "max_tokens": max_tokens,
+                    "temperature": temperature,
+                    "top_p": top_p,
+                    "frequency_penalty": frequency_penalty,
+                    "presence_penalty": presence_penalty
+                }
+                
+                # Stream the reply as Server-Sent Events if the client asked for it
+                if request_data.get('stream'):
+                    if message_history:
+                        gen_kwargs["messages"] = message_history
+                    else:
+                        gen_kwargs["prompt"] = message
+                    self._stream_chat(model_path, gen_kwargs, context_docs)
+                    return
                 
                 # Generate response using the quiet inference module with history
-                if message_history and len(message_history) > 0:
-                    # If we have history, use it for context
-                    result = minimal_inference.generate_with_history(
-                        model_path=model_path,
-                        messages=message_history,
-                        system_prompt=system_message,
-                        max_tokens=max_tokens,
-                        temperature=temperature,
-                        top_p=top_p,
-                        frequency_penalty=frequency_penalty,
-                        presence_penalty=presence_penalty
-                    )
-                else:
-                    # Otherwise, use the simple generate function
-                    result = minimal_inference.generate(
-                        model_path=model_path,
-                        prompt=message,
-                        system_prompt=system_message,
-                        max_tokens=max_tokens,
-                        temperature=temperature,
-                        top_p=top_p,
-                        frequency_penalty=frequency_penalty,
-                        presence_penalty=presence_penalty
-                    )
+                with generation_lock:
+                    if message_history and len(message_history) > 0:
+                        # If we have history, use it for context
+                        result = minimal_inference.generate_with_history(
+                            model_path=model_path,
+                            messages=message_history,
+                            **gen_kwargs
+                        )
+                    else:
+                        # Otherwise, use the simple generate function
+                        result = minimal_inference.generate(
+                            model_path=model_path,
+                            prompt=message,
+                            **gen_kwargs
+                        )
                 
                 # If there was an error, return it
                 if "error" in result:
@@ -1224,28 +1661,25 @@ class RequestHandler(http.server.SimpleHTTPRequestHandler):
                 
             except ImportError as e:
                 error_context = "Loading inference module"
-                ErrorHandler.log_error(e, context=error_context, include_traceback=DEBUG_MODE)
+                ErrorHandler.log_error(e, context=error_context, include_traceback=self._DEBUG_MODE)
                 response = {
                     "error": f"Error: Could not load inference module. {str(e)}",
                     "error_type": "ImportError",
                     "model": model_path,
                     "recommendation": "Please make sure the required libraries are installed (llama-cpp-python or transformers)"
                 }
-                if DEBUG_MODE:
+                if self._DEBUG_MODE:
                     response["traceback"] = traceback.format_exc()
             except Exception as e:
                 error_context = f"Generating response for model {model_path}"
                 response = ErrorHandler.handle_api_error(
                     e, 
                     context=error_context, 
-                    include_traceback=DEBUG_MODE
+                    include_traceback=self._DEBUG_MODE
                 )
                 response["model"] = model_path
             
-            self.send_response(200)
-            self.send_header('Content-type', 'application/json')
-            self.end_headers()
-            self.wfile.write(json.dumps(response).encode('utf-8'))
+            self._send_json(200, response)
         else:
             self.send_error(404, "Endpoint not found")
 
@@ -1254,6 +1688,13 @@ def open_browser(port):
     time.sleep(1)
     webbrowser.open(f'http://localhost:{port}')
 
+def _watch_worker(pid, stopping):
+    """Reap a worker process, reporting it if it exits before the server stops"""
+    _, status = os.waitpid(pid, 0)
+    if not stopping.is_set():
+        logger.error("Worker process %d exited unexpectedly with code %d",
+                     pid, os.waitstatus_to_exitcode(status))
+
 if __name__ == '__main__':
     print(f"Starting LLM interface...")
     
@@ -1263,9 +1704,6 @@ if __name__ == '__main__':
         
         # Verify RAG support is accessible
         try:
-            # Import and initialize RAG modules - use a context manager to capture import errors
-            import importlib
-            
             # Try to import rag_support
             try:
                 import rag_support
@@ -1276,6 +1714,7 @@ if __name__ == '__main__':
                     traceback.print_exc()
                 print("Disabling RAG features due to import error")
                 RAG_ENABLED = False
+                RequestHandler._RAG_ENABLED = False
                 raise ImportError(f"Critical RAG module import error: {e}")
             
             # Try to import utils 
@@ -1304,27 +1743,86 @@ if __name__ == '__main__':
             if DEBUG_MODE:
                 traceback.print_exc()
     
-    # Enable address reuse to prevent port binding issues
-    socketserver.TCPServer.allow_reuse_address = True
+    # Render the main page up front so the first visit is served from cache.
+    # A failure here is reported again, with details, when the page is requested
+    if not DEBUG_MODE:
+        try:
+            _get_index_page()
+        except Exception as e:
+            print(f"Error pre-rendering main page: {e}")
+    
+    # Set up the server - each connection is handled in its own thread, and
+    # HTTPServer enables address reuse. The socket is bound below, so one
+    # server is created and only its bind is retried across ports
+    httpd = http.server.ThreadingHTTPServer(("", START_PORT), RequestHandler, bind_and_activate=False)
     
     # Try to find an available port
     for port in range(START_PORT, END_PORT + 1):
+        httpd.server_address = ("", port)
         try:
-            # Set up the server
-            httpd = socketserver.TCPServer(("", port), RequestHandler)
-            print(f"Server running on port {port}")
-            print(f"Open your browser to http://localhost:{port}")
-            
-            # Open browser in a separate thread
-            threading.Thread(target=open_browser, args=(port,)).start()
-            
-            # Start the server
-            httpd.serve_forever()
-        except OSError:
+            httpd.server_bind()
+            break
+        except OSError as e:
+            # Only a port that is taken or reserved moves on to the next one;
+            # any other bind failure is a real error
+            if e.errno not in (errno.EADDRINUSE, errno.EACCES):
+                raise
             print(f"Port {port} is in use, trying next port...")
-        except KeyboardInterrupt:
-            print("Server stopped by user")
-            sys.exit(0)
+    else:
+        print("Could not find an available port")
+        sys.exit(1)
+    
+    httpd.server_activate()
     
-    print("Could not find an available port")
-    sys.exit(1)
\ No newline at end of file
+    # Fork extra worker processes that accept connections on the same
+    # listening socket, so chat requests can generate in parallel instead
+    # of queueing behind one process's generation lock
+    worker_pids = []
+    is_worker = False
+    for _ in range(WORKERS - 1):
+        pid = os.fork()
+        if pid == 0:
+            is_worker = True
+            worker_pids = []
+            break
+        worker_pids.append(pid)
+    
+    # Each worker has a thread waiting on it, so a worker that dies is
+    # reported and reaped instead of being left as a zombie
+    stopping = threading.Event()
+    watchers = [
+        threading.Thread(target=_watch_worker, args=(pid, stopping), daemon=True)
+        for pid in worker_pids
+    ]
+    for watcher in watchers:
+        watcher.start()
+    
+    if worker_pids:
+        # Turn SIGTERM into a normal exit so the workers are stopped too
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    
+    if not is_worker:
+        print(f"Server running on port {port}")
+        if WORKERS > 1:
+            print(f"Serving with {WORKERS} worker processes")
+        print(f"Open your browser to http://localhost:{port}")
+        
+        # Open browser in a separate thread
+        threading.Thread(target=open_browser, args=(port,)).start()
+    
+    # Start the server
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        if not is_worker:
+            print("Server stopped by user")
+        sys.exit(0)
+    finally:
+        stopping.set()
+        for pid in worker_pids:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass  # Already exited and reaped
+        for watcher in watchers:
+            watcher.join()
@@ -25,9 +25,11 @@ window.API = {
     /**
      * Send a chat message to the API
      * @param {Object} params - The parameters for the chat request
+     * @param {Function} [onToken] - If given, the reply is streamed and each text chunk is passed to it
      * @returns {Promise} Promise that resolves to the chat response
      */
-    sendMessage: async function(params) {
+    sendMessage: async function(params, onToken) {
+        const streaming = typeof onToken === 'function';
         try {
             const response = await fetch('/api/chat', {
                 method: 'POST',
@@ -45,7 +47,8 @@ window.API = {
                     presence_penalty: params.presence_penalty || 0.0,
                     history: params.history || [],
                     context_docs: params.context_docs || [],
-                    project_id: params.project_id || null
+                    project_id: params.project_id || null,
+                    stream: streaming
                 })
             });
             
@@ -53,6 +56,9 @@ window.API = {
                 throw new Error(`Error sending message: ${response.status} ${response.statusText}`);
             }
             
+            if (streaming) {
+                return await this.readChatStream(response, onToken);
+            }
             return await response.json();
         } catch (error) {
             console.error('Error sending message:', error);
@@ -60,6 +66,45 @@ window.API = {
         }
     },
     
+    /**
+     * Read a Server-Sent Events chat reply, passing each text chunk to onToken
+     * @param {Response} response - The streaming fetch response
+     * @param {Function} onToken - Called with each text chunk as it arrives
+     * @returns {Promise} Promise that resolves to the final chat response
+     */
+    readChatStream: async function(response, onToken) {
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        let text = '';
+        
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+            
+            // Events are separated by a blank line
+            let end;
+            while ((end = buffer.indexOf('\n\n')) !== -1) {
+                const event = buffer.slice(0, end);
+                buffer = buffer.slice(end + 2);
+                if (!event.startsWith('data: ')) continue;
+                
+                const data = JSON.parse(event.slice(6));
+                if (data.token !== undefined) {
+                    text += data.token;
+                    onToken(data.token);
+                } else {
+                    // Final event: stats when done, or an error
+                    if (!data.error) data.response = text;
+                    return data;
+                }
+            }
+        }
+        
+        throw new Error('Chat stream ended unexpectedly');
+    },
+    
     /**
      * RAG API Functions (only available when RAG is enabled)
      */
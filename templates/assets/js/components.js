@@ -14,6 +14,7 @@ LLM.Components = {
         // Properties
         chatHistory: [],
         currentChatId: Date.now().toString(),
+        saveTimer: null,
         
         // Initialize the component
         init: function() {
@@ -44,42 +45,94 @@ LLM.Components = {
                 exportChatButton.addEventListener('click', this.exportChat.bind(this));
             }
             
+            // Write any pending history save before the page goes away
+            window.addEventListener('pagehide', this.flushChatHistory.bind(this));
+            
             // Load saved chat history
             this.loadChatHistory();
         },
         
+        // Move chats saved by earlier versions to per-chat llm_chats/<id> keys
+        migrateChatStorage: function() {
+            try {
+                const legacyChats = localStorage.getItem('llm_chats');
+                const legacyHistory = localStorage.getItem('llm_chat_history');
+                if (legacyChats === null && legacyHistory === null) return;
+                
+                // The llm_chats map held every chat; llm_chat_history held the
+                // current chat id and a copy of that chat
+                const chats = JSON.parse(legacyChats || '{}');
+                const history = JSON.parse(legacyHistory || '{}');
+                Object.assign(chats, history.chats || {});
+                
+                for (const id of Object.keys(chats)) {
+                    if (localStorage.getItem('llm_chats/' + id) === null) {
+                        localStorage.setItem('llm_chats/' + id, JSON.stringify(chats[id]));
+                    }
+                }
+                if (history.currentChatId && localStorage.getItem('llm_current_chat') === null) {
+                    localStorage.setItem('llm_current_chat', history.currentChatId);
+                }
+                
+                localStorage.removeItem('llm_chats');
+                localStorage.removeItem('llm_chat_history');
+            } catch (e) {
+                console.error('Error migrating chat history:', e);
+            }
+        },
+        
         // Load chat history from localStorage
         loadChatHistory: function() {
-            const savedHistory = localStorage.getItem('llm_chat_history');
-            if (savedHistory) {
+            this.migrateChatStorage();
+            
+            const chatId = localStorage.getItem('llm_current_chat');
+            const savedChat = chatId && localStorage.getItem('llm_chats/' + chatId);
+            if (savedChat) {
                 try {
-                    const savedData = JSON.parse(savedHistory);
-                    if (savedData.currentChatId && savedData.chats && savedData.chats[savedData.currentChatId]) {
-                        this.currentChatId = savedData.currentChatId;
-                        this.chatHistory = savedData.chats[this.currentChatId] || [];
-                        this.renderChatHistory();
-                    }
+                    this.currentChatId = chatId;
+                    this.chatHistory = JSON.parse(savedChat) || [];
+                    this.renderChatHistory();
                 } catch (e) {
                     console.error('Error loading chat history:', e);
                 }
             }
         },
         
-        // Save chat history to localStorage
+        // Save chat history to localStorage, batching bursts of messages
         saveChatHistory: function() {
+            if (this.saveTimer) return;
+            this.saveTimer = setTimeout(this.flushChatHistory.bind(this), 500);
+        },
+        
+        // Write the current chat to localStorage now
+        flushChatHistory: function() {
+            if (this.saveTimer) {
+                clearTimeout(this.saveTimer);
+                this.saveTimer = null;
+            }
+            
             try {
-                const allChats = JSON.parse(localStorage.getItem('llm_chats') || '{}');
-                allChats[this.currentChatId] = this.chatHistory;
-                localStorage.setItem('llm_chats', JSON.stringify(allChats));
-                localStorage.setItem('llm_chat_history', JSON.stringify({
-                    currentChatId: this.currentChatId,
-                    chats: { [this.currentChatId]: this.chatHistory }
-                }));
+                // Each chat has its own key, so saving never re-parses the
+                // other chats; llm_current_chat only records which one is open
+                localStorage.setItem('llm_chats/' + this.currentChatId, JSON.stringify(this.chatHistory));
+                localStorage.setItem('llm_current_chat', this.currentChatId);
             } catch (e) {
                 console.error('Error saving chat history:', e);
             }
         },
         
+        // Build the HTML for a single chat message
+        renderMessage: function(message) {
+            const timestamp = new Date(message.timestamp).toLocaleTimeString();
+            const roleClass = message.role === 'user' ? 'message-user' : 'message-assistant';
+            return `
+                <div class="chat-message">
+                    <div class="${roleClass}">${this.escapeHtml(message.content)}</div>
+                    <div class="message-meta">${timestamp}</div>
+                </div>
+            `;
+        },
+        
         // Render chat history in the UI
         renderChatHistory: function() {
             const chatHistoryDiv = document.getElementById('chatHistory');
@@ -90,48 +143,57 @@ LLM.Components = {
                 return;
             }
             
-            let html = '';
-            this.chatHistory.forEach(message => {
-                const timestamp = new Date(message.timestamp).toLocaleTimeString();
-                if (message.role === 'user') {
-                    html += `
-                        <div class="chat-message">
-                            <div class="message-user">${this.escapeHtml(message.content)}</div>
-                            <div class="message-meta">${timestamp}</div>
-                        </div>
-                    `;
-                } else if (message.role === 'assistant') {
-                    html += `
-                        <div class="chat-message">
-                            <div class="message-assistant">${this.escapeHtml(message.content)}</div>
-                            <div class="message-meta">${timestamp}</div>
-                        </div>
-                    `;
-                }
-            });
-            
-            chatHistoryDiv.innerHTML = html;
+            chatHistoryDiv.innerHTML = this.chatHistory
+                .filter(message => message.role === 'user' || message.role === 'assistant')
+                .map(message => this.renderMessage(message))
+                .join('');
             
             // Scroll to bottom
             chatHistoryDiv.scrollTop = chatHistoryDiv.scrollHeight;
         },
         
-        // Helper function to escape HTML
+        // Characters that must be escaped in HTML text, and their entities
+        htmlEscapes: { '&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;' },
+        htmlEscapePattern: /[&<>"']/g,
+        
+        // Helper function to escape HTML without creating a DOM node
         escapeHtml: function(text) {
-            const div = document.createElement('div');
-            div.textContent = text;
-            return div.innerHTML;
+            return String(text).replace(this.htmlEscapePattern, ch => this.htmlEscapes[ch]);
         },
         
         // Add message to chat history
         addMessageToHistory: function(role, content) {
-            this.chatHistory.push({
+            const message = {
                 role,
                 content,
                 timestamp: Date.now()
-            });
+            };
+            this.chatHistory.push(message);
             this.saveChatHistory();
-            this.renderChatHistory();
+            
+            // Append only the new message instead of re-rendering the history
+            const chatHistoryDiv = document.getElementById('chatHistory');
+            if (!chatHistoryDiv) return;
+            
+            if (this.chatHistory.length === 1) {
+                // Replace the empty-chat placeholder
+                chatHistoryDiv.innerHTML = '';
+            }
+            chatHistoryDiv.insertAdjacentHTML('beforeend', this.renderMessage(message));
+            chatHistoryDiv.scrollTop = chatHistoryDiv.scrollHeight;
+        },
+        
+        // Add an empty assistant message that streamed text is appended to
+        startStreamingMessage: function() {
+            const chatHistoryDiv = document.getElementById('chatHistory');
+            if (!chatHistoryDiv) return null;
+            
+            chatHistoryDiv.insertAdjacentHTML('beforeend', this.renderMessage({
+                role: 'assistant',
+                content: '',
+                timestamp: Date.now()
+            }));
+            return chatHistoryDiv.lastElementChild;
         },
         
         // Send a message to the API
@@ -215,11 +277,30 @@ LLM.Components = {
                 params.project_id = projectId;
             }
             
+            // Show the reply as it streams in, in a placeholder message that
+            // is replaced by the saved message once the reply is complete
+            let streamingMessage = null;
+            let streamingContent = null;
+            const onToken = token => {
+                if (!streamingMessage) {
+                    streamingMessage = this.startStreamingMessage();
+                    if (!streamingMessage) return;
+                    streamingContent = streamingMessage.querySelector('.message-assistant');
+                    if (spinner) spinner.style.display = 'none';
+                }
+                streamingContent.appendChild(document.createTextNode(token));
+                streamingMessage.parentNode.scrollTop = streamingMessage.parentNode.scrollHeight;
+            };
+            const removeStreamingMessage = () => {
+                if (streamingMessage) streamingMessage.remove();
+            };
+            
             // Send message to API
-            API.sendMessage(params)
+            API.sendMessage(params, onToken)
                 .then(data => {
                     // Hide spinner
                     if (spinner) spinner.style.display = 'none';
+                    removeStreamingMessage();
                     
                     if (data.error) {
                         // Add error message to chat
@@ -250,6 +331,7 @@ LLM.Components = {
                 })
                 .catch(error => {
                     if (spinner) spinner.style.display = 'none';
+                    removeStreamingMessage();
                     this.addMessageToHistory('assistant', 'Error: ' + error.message);
                     if (sendBtn) sendBtn.disabled = false;
                 });
@@ -258,9 +340,12 @@ LLM.Components = {
         // Start a new chat
         newChat: function() {
             if (confirm('Start a new chat? This will clear the current conversation.')) {
+                // Write out the finished chat before switching to a new one
+                this.flushChatHistory();
+                
                 this.chatHistory = [];
                 this.currentChatId = Date.now().toString();
-                this.saveChatHistory();
+                this.flushChatHistory();
                 this.renderChatHistory();
                 
                 const userInput = document.getElementById('userInput');
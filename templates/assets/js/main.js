@@ -8,6 +8,10 @@
 let chatHistory = [];
 let currentChatId = Date.now().toString();
 
+// Characters that must be escaped in HTML text, and their entities
+const HTML_ESCAPES = { '&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;' };
+const HTML_ESCAPE_PATTERN = /[&<>"']/g;
+
 // Only run initialization after DOM is loaded
 document.addEventListener('DOMContentLoaded', function() {
     console.log("Legacy main script loaded");
@@ -89,33 +93,57 @@ document.addEventListener('DOMContentLoaded', function() {
     }
 });
 
+// Move chats saved by earlier versions to per-chat llm_chats/<id> keys
+function migrateChatStorage() {
+    try {
+        const legacyChats = localStorage.getItem('llm_chats');
+        const legacyHistory = localStorage.getItem('llm_chat_history');
+        if (legacyChats === null && legacyHistory === null) return;
+        
+        // The llm_chats map held every chat; llm_chat_history held the
+        // current chat id and a copy of that chat
+        const chats = JSON.parse(legacyChats || '{}');
+        const history = JSON.parse(legacyHistory || '{}');
+        Object.assign(chats, history.chats || {});
+        
+        for (const id of Object.keys(chats)) {
+            if (localStorage.getItem('llm_chats/' + id) === null) {
+                localStorage.setItem('llm_chats/' + id, JSON.stringify(chats[id]));
+            }
+        }
+        if (history.currentChatId && localStorage.getItem('llm_current_chat') === null) {
+            localStorage.setItem('llm_current_chat', history.currentChatId);
+        }
+        
+        localStorage.removeItem('llm_chats');
+        localStorage.removeItem('llm_chat_history');
+    } catch (e) {
+        console.error('Error migrating chat history:', e);
+    }
+}
+
 // Load chat history from localStorage if available
 function loadChatHistory() {
-    const savedHistory = localStorage.getItem('llm_chat_history');
-    if (savedHistory) {
+    migrateChatStorage();
+    
+    const chatId = localStorage.getItem('llm_current_chat');
+    const savedChat = chatId && localStorage.getItem('llm_chats/' + chatId);
+    if (savedChat) {
         try {
-            const savedData = JSON.parse(savedHistory);
-            if (savedData.currentChatId && savedData.chats && savedData.chats[savedData.currentChatId]) {
-                currentChatId = savedData.currentChatId;
-                chatHistory = savedData.chats[currentChatId] || [];
-                renderChatHistory();
-            }
+            currentChatId = chatId;
+            chatHistory = JSON.parse(savedChat) || [];
+            renderChatHistory();
         } catch (e) {
             console.error('Error loading chat history:', e);
         }
     }
 }
 
-// Save chat history to localStorage
+// Save chat history to localStorage, one key per chat
 function saveChatHistory() {
     try {
-        const allChats = JSON.parse(localStorage.getItem('llm_chats') || '{}');
-        allChats[currentChatId] = chatHistory;
-        localStorage.setItem('llm_chats', JSON.stringify(allChats));
-        localStorage.setItem('llm_chat_history', JSON.stringify({
-            currentChatId,
-            chats: { [currentChatId]: chatHistory }
-        }));
+        localStorage.setItem('llm_chats/' + currentChatId, JSON.stringify(chatHistory));
+        localStorage.setItem('llm_current_chat', currentChatId);
     } catch (e) {
         console.error('Error saving chat history:', e);
     }
@@ -157,9 +185,7 @@ function renderChatHistory() {
 
 // Helper function to escape HTML
 function escapeHtml(text) {
-    const div = document.createElement('div');
-    div.textContent = text;
-    return div.innerHTML;
+    return String(text).replace(HTML_ESCAPE_PATTERN, ch => HTML_ESCAPES[ch]);
 }
 
 // Add message to chat history
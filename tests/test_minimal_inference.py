@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the minimal inference module.
+
+The model manager is given stand-in models, so no model files are loaded.
+"""
+
+import sys
+import os
+import json
+import time
+import queue
+import types
+import asyncio
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch, MagicMock
+
+# Add scripts directory to path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+
+import minimal_inference_quiet as minimal_inference
+from minimal_inference_quiet import LazyErrorResult
+
+
+class FakeStreamer:
+    """Stand-in for transformers.TextIteratorStreamer."""
+
+    def __init__(self, tokenizer, **kwargs):
+        self.queue = queue.Queue()
+
+    def put(self, text):
+        self.queue.put(text)
+
+    def end(self):
+        self.queue.put(None)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        text = self.queue.get(timeout=5)
+        if text is None:
+            raise StopIteration
+        return text
+
+
+class FakeStoppingCriteriaList(list):
+    """Stand-in for transformers.StoppingCriteriaList."""
+
+    def __call__(self, input_ids, scores, **kwargs):
+        return any(criteria(input_ids, scores, **kwargs) for criteria in self)
+
+
+FAKE_TRANSFORMERS = types.SimpleNamespace(
+    StoppingCriteria=object,
+    StoppingCriteriaList=FakeStoppingCriteriaList,
+    TextIteratorStreamer=FakeStreamer,
+)
+
+
+class GenerateStreamTestCase(unittest.TestCase):
+    """Base class registering a fake model with the model manager."""
+
+    model_path = "LLM-MODELS/test/model"
+
+    def setUp(self):
+        """Set up test environment."""
+        manager = minimal_inference.model_manager
+        patchers = [
+            patch.dict(manager.models, {self.model_path: self.model_info()}),
+            patch.object(manager, "format_prompt", return_value="prompt"),
+            patch.dict(sys.modules, {"transformers": FAKE_TRANSFORMERS}),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def model_info(self):
+        """Return the model entry to register."""
+        raise NotImplementedError
+
+
+class TestGenerateStreamLoading(unittest.TestCase):
+    """Tests for loading a model on the first streamed request."""
+
+    def test_load_options_passed_through(self):
+        """Test that quant and draft_path reach load_model."""
+        manager = minimal_inference.model_manager
+        with patch.object(manager, "load_model", return_value=False) as load_model:
+            stream = minimal_inference.generate_stream(
+                "LLM-MODELS/missing", "Hi", quant="nf4", draft_path="LLM-MODELS/draft"
+            )
+            with self.assertRaises(RuntimeError):
+                next(stream)
+
+        load_model.assert_called_once_with("LLM-MODELS/missing", quant="nf4", draft_path="LLM-MODELS/draft")
+
+
+class TestGenerateStreamLlama(GenerateStreamTestCase):
+    """Tests for generate_stream with llama.cpp models."""
+
+    def model_info(self):
+        """Return the model entry to register."""
+        self.model = MagicMock()
+        self.model.create_completion.return_value = iter(
+            {"choices": [{"text": text}]} for text in ["Hel", "lo"]
+        )
+        return {"type": "llama.cpp", "model": self.model}
+
+    def test_yields_completion_chunks(self):
+        """Test that each completion chunk's text is yielded."""
+        chunks = list(minimal_inference.generate_stream(self.model_path, "Hi", max_tokens=8))
+
+        self.assertEqual(chunks, ["Hel", "lo"])
+        kwargs = self.model.create_completion.call_args.kwargs
+        self.assertTrue(kwargs["stream"])
+        self.assertEqual(kwargs["max_tokens"], 8)
+
+
+class TestGenerateStreamTransformers(GenerateStreamTestCase):
+    """Tests for generate_stream with transformers models."""
+
+    def model_info(self):
+        """Return the model entry to register."""
+        self.stopped_at = None
+        self.pipeline_error = None
+        self.hold_after_first = False
+        self.pipeline_done = threading.Event()
+        return {"type": "transformers", "tokenizer": None, "pipeline": self.pipeline}
+
+    def pipeline(self, prompt, streamer, stopping_criteria, **kwargs):
+        """Fake pipeline streaming numbered tokens until stopped."""
+        try:
+            for i in range(1000):
+                if stopping_criteria(None, None):
+                    self.stopped_at = i
+                    break
+                if self.pipeline_error is not None and i == 2:
+                    raise self.pipeline_error
+                streamer.put(str(i))
+                if i == kwargs["max_new_tokens"] - 1:
+                    break
+                if self.hold_after_first:
+                    # Keep generating until the consumer stops the pipeline
+                    deadline = time.monotonic() + 5
+                    while not stopping_criteria(None, None) and time.monotonic() < deadline:
+                        time.sleep(0.001)
+            streamer.end()
+        finally:
+            self.pipeline_done.set()
+
+    def test_yields_streamed_text(self):
+        """Test that text is yielded as the pipeline streams it."""
+        chunks = list(minimal_inference.generate_stream(self.model_path, "Hi", max_tokens=3))
+        self.assertEqual(chunks, ["0", "1", "2"])
+
+    def test_pipeline_error_is_raised(self):
+        """Test that a failing pipeline ends the stream with its error."""
+        self.pipeline_error = MemoryError("out of memory")
+        stream = minimal_inference.generate_stream(self.model_path, "Hi", max_tokens=10)
+
+        with self.assertRaises(MemoryError):
+            list(stream)
+
+    def test_close_stops_generation(self):
+        """Test that closing the stream stops the pipeline before returning."""
+        self.hold_after_first = True
+        stream = minimal_inference.generate_stream(self.model_path, "Hi", max_tokens=1000)
+        self.assertEqual(next(stream), "0")
+        stream.close()
+
+        self.assertTrue(self.pipeline_done.is_set())
+        self.assertEqual(self.stopped_at, 1)
+
+
+class TestLazyErrorResult(unittest.TestCase):
+    """Tests for LazyErrorResult."""
+
+    def setUp(self):
+        """Set up test environment."""
+        try:
+            raise ValueError("bad value")
+        except ValueError as e:
+            self.result = LazyErrorResult("Error generating text: bad value", e)
+
+    def test_error_is_available(self):
+        """Test that the error message is a plain dict entry."""
+        self.assertEqual(self.result["error"], "Error generating text: bad value")
+        self.assertEqual(dict(self.result), {"error": "Error generating text: bad value"})
+
+    def test_traceback_is_formatted_on_access(self):
+        """Test that the traceback is formatted only when read."""
+        self.assertIn("traceback", self.result)
+        self.assertNotIn("traceback", self.result.keys())
+
+        traceback_text = self.result["traceback"]
+        self.assertIn("ValueError: bad value", traceback_text)
+        self.assertIs(self.result.get("traceback"), traceback_text)
+
+    def test_missing_keys(self):
+        """Test that other missing keys behave like a dict."""
+        self.assertNotIn("text", self.result)
+        self.assertIsNone(self.result.get("text"))
+        self.assertEqual(self.result.get("text", "default"), "default")
+        with self.assertRaises(KeyError):
+            self.result["text"]
+
+
+class TestWarmUp(unittest.TestCase):
+    """Tests for the load-time warm-up generation."""
+
+    def test_warm_up_output_is_discarded(self):
+        """Test that Python and native output of the warm-up is discarded."""
+        def generator(*args):
+            print("python output")
+            os.write(1, b"native output\n")
+            os.write(2, b"native error\n")
+            return "", 1, 1
+
+        manager = minimal_inference.model_manager
+        with tempfile.TemporaryFile() as captured, \
+                patch.object(manager, "_make_generator", return_value=generator), \
+                patch.dict(manager.models), patch.dict(manager.generators):
+            sys.stdout.flush()
+            sys.stderr.flush()
+            saved_fds = [os.dup(1), os.dup(2)]
+            os.dup2(captured.fileno(), 1)
+            os.dup2(captured.fileno(), 2)
+            try:
+                manager._register_model("LLM-MODELS/test/model", {"type": "llama.cpp"})
+                sys.stdout.flush()
+                sys.stderr.flush()
+            finally:
+                os.dup2(saved_fds[0], 1)
+                os.dup2(saved_fds[1], 2)
+                for fd in saved_fds:
+                    os.close(fd)
+
+            captured.seek(0)
+            output = captured.read()
+            self.assertIs(manager.generators["LLM-MODELS/test/model"], generator)
+
+        self.assertNotIn(b"output", output)
+        self.assertNotIn(b"error", output)
+
+
+class TestHandleClient(unittest.TestCase):
+    """Tests for the JSON-lines request handler."""
+
+    def exchange(self, data, limit=2 ** 16):
+        """Send data to a handler and return the reply lines."""
+        async def run():
+            executor = ThreadPoolExecutor(max_workers=1)
+            server = await asyncio.start_server(
+                lambda reader, writer: minimal_inference._handle_client(reader, writer, executor),
+                "127.0.0.1", 0, limit=limit
+            )
+            port = server.sockets[0].getsockname()[1]
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(data)
+            writer.write_eof()
+            replies = [json.loads(line) for line in (await reader.read()).splitlines()]
+            writer.close()
+            server.close()
+            await server.wait_closed()
+            executor.shutdown()
+            return replies
+
+        return asyncio.run(run())
+
+    def setUp(self):
+        """Set up test environment."""
+        patcher = patch.object(
+            minimal_inference, "generate",
+            side_effect=lambda model_path, prompt, **kwargs: {"text": f"{model_path}:{prompt}"}
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_replies_in_order(self):
+        """Test that each request line gets one reply line in order."""
+        replies = self.exchange(b'{"model": "a", "prompt": "1"}\n{"model": "b", "prompt": "2"}')
+        self.assertEqual(replies, [{"text": "a:1"}, {"text": "b:2"}])
+
+    def test_invalid_requests(self):
+        """Test that invalid requests are answered with errors."""
+        replies = self.exchange(b'not json\n[1]\n{"prompt": "no model"}\n')
+        self.assertEqual(len(replies), 3)
+        for reply in replies:
+            self.assertTrue(reply["error"].startswith("Invalid request"))
+
+    def test_oversized_line(self):
+        """Test that a line over the limit is answered and skipped."""
+        long_line = b'{"model": "b", "prompt": "' + b"x" * 1000 + b'"}\n'
+        replies = self.exchange(
+            b'{"model": "a", "prompt": "1"}\n' + long_line + b'{"model": "c", "prompt": "3"}\n',
+            limit=100
+        )
+        self.assertEqual(replies[0], {"text": "a:1"})
+        self.assertIn("too long", replies[1]["error"])
+        self.assertEqual(replies[2], {"text": "c:3"})
+        self.assertEqual(len(replies), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Unit tests for ProjectManager document and project lookups.
+
+Each test works on its own temporary projects directory.
+"""
+
+import os
+import sys
+import json
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from rag_support.utils.project_manager import ProjectManager
+
+
+class ProjectManagerTestCase(unittest.TestCase):
+    """Base class giving each test a project manager on an empty directory."""
+
+    def setUp(self):
+        """Set up test environment."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.manager = ProjectManager()
+        self.manager.projects_dir = Path(self.temp_dir)
+
+    def tearDown(self):
+        """Clean up test environment."""
+        shutil.rmtree(self.temp_dir)
+
+    def document_path(self, project_id, doc_id):
+        """Return the markdown file of a document."""
+        return self.manager.get_storage(project_id).directory / f"{doc_id}.md"
+
+
+class TestGetDocument(ProjectManagerTestCase):
+    """Tests for the get_document cache."""
+
+    def setUp(self):
+        """Set up test environment."""
+        super().setUp()
+        self.project_id = self.manager.create_project("Test Project")
+        self.doc_id = self.manager.add_document(
+            self.project_id, "Doc", "Original content", tags=["a"]
+        )
+
+    def test_repeated_lookup_is_cached(self):
+        """Test that an unchanged document is only loaded once."""
+        with patch.object(
+            self.manager, "_load_document", wraps=self.manager._load_document
+        ) as load:
+            first = self.manager.get_document(self.project_id, self.doc_id)
+            second = self.manager.get_document(self.project_id, self.doc_id)
+
+        self.assertEqual(load.call_count, 1)
+        self.assertEqual(first, second)
+        self.assertEqual(second["content"], "Original content")
+
+    def test_update_invalidates_cache(self):
+        """Test that an edited document is reloaded."""
+        self.manager.get_document(self.project_id, self.doc_id)
+        self.manager.update_document(self.project_id, self.doc_id, content="New content")
+
+        document = self.manager.get_document(self.project_id, self.doc_id)
+        self.assertEqual(document["content"], "New content")
+
+    def test_deleted_document_returns_none(self):
+        """Test that a cached document is not returned after deletion."""
+        self.manager.get_document(self.project_id, self.doc_id)
+        self.manager.delete_document(self.project_id, self.doc_id)
+
+        self.assertIsNone(self.manager.get_document(self.project_id, self.doc_id))
+
+    def test_failed_load_is_not_cached(self):
+        """Test that a transient load failure is retried."""
+        with patch.object(self.manager, "_load_document", return_value=None):
+            self.assertIsNone(self.manager.get_document(self.project_id, self.doc_id))
+
+        document = self.manager.get_document(self.project_id, self.doc_id)
+        self.assertEqual(document["content"], "Original content")
+
+    def test_callers_cannot_modify_cache(self):
+        """Test that nested values of a returned document are copies."""
+        document = self.manager.get_document(self.project_id, self.doc_id)
+        document["title"] = "Changed"
+        document["tags"].append("b")
+
+        document = self.manager.get_document(self.project_id, self.doc_id)
+        self.assertEqual(document["title"], "Doc")
+        self.assertEqual(document["tags"], ["a"])
+
+    def test_storage_error_returns_none(self):
+        """Test that a failing storage lookup is treated as a missing document."""
+        with patch.object(self.manager, "get_storage", side_effect=PermissionError("denied")):
+            self.assertIsNone(self.manager.get_document(self.project_id, self.doc_id))
+
+    def test_same_mtime_different_size_invalidates_cache(self):
+        """Test that an edit within the mtime resolution is still seen."""
+        path = self.document_path(self.project_id, self.doc_id)
+        self.manager.get_document(self.project_id, self.doc_id)
+        stat = path.stat()
+
+        path.write_text(path.read_text().replace("Original content", "Longer new content"))
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+        document = self.manager.get_document(self.project_id, self.doc_id)
+        self.assertEqual(document["content"], "Longer new content")
+
+
+class TestGetDocumentSize(ProjectManagerTestCase):
+    """Tests for get_document_size."""
+
+    def setUp(self):
+        """Set up test environment."""
+        super().setUp()
+        self.project_id = self.manager.create_project("Test Project")
+
+    def test_file_size(self):
+        """Test that the size is that of the document file, frontmatter included."""
+        doc_id = self.manager.add_document(self.project_id, "Title", "content", tags=["a"])
+        path = self.manager.get_storage(self.project_id).directory / f"{doc_id}.md"
+
+        self.assertEqual(self.manager.get_document_size(self.project_id, doc_id), path.stat().st_size)
+        self.assertGreater(path.stat().st_size, len("content"))
+
+    def test_missing_document(self):
+        """Test that a missing document has no size."""
+        self.assertIsNone(self.manager.get_document_size(self.project_id, "missing"))
+
+
+class TestFirstProjectId(ProjectManagerTestCase):
+    """Tests for first_project_id."""
+
+    def write_project(self, name, project_id, updated_at):
+        """Write a bare project.json into a project directory."""
+        project_dir = Path(self.temp_dir) / name
+        project_dir.mkdir()
+        with open(project_dir / "project.json", "w") as f:
+            json.dump({"id": project_id, "name": name, "updated_at": updated_at}, f)
+
+    def test_no_projects(self):
+        """Test that an empty projects directory has no first project."""
+        self.assertIsNone(self.manager.first_project_id())
+
+    def test_missing_projects_directory(self):
+        """Test that a missing projects directory has no first project."""
+        self.manager.projects_dir = Path(self.temp_dir) / "missing"
+        self.assertIsNone(self.manager.first_project_id())
+
+    def test_skips_non_project_directories(self):
+        """Test that only directories with a project.json are projects."""
+        (Path(self.temp_dir) / ".hidden").mkdir()
+        (Path(self.temp_dir) / "not-a-project").mkdir()
+        project_id = self.manager.create_project("Test Project")
+
+        self.assertEqual(self.manager.first_project_id(), project_id)
+
+    def test_most_recently_updated(self):
+        """Test that the most recently updated project is picked, cached or not."""
+        self.write_project("a", "a", "2024-01-02T00:00:00")
+        self.write_project("b", "b", "2024-03-01T00:00:00")
+        self.write_project("c", "c", "2024-02-01T00:00:00")
+
+        self.assertEqual(self.manager.first_project_id(), "b")
+        self.manager.get_projects(force_refresh=True)
+        self.assertEqual(self.manager.first_project_id(), "b")
+
+    def test_id_from_project_file(self):
+        """Test that the ID is read from project.json, not the directory name."""
+        self.write_project("renamed", "project-id", "2024-01-01T00:00:00")
+
+        self.assertEqual(self.manager.first_project_id(), "project-id")
+        self.manager.get_projects(force_refresh=True)
+        self.assertEqual(self.manager.first_project_id(), "project-id")
+
+    def test_uses_fresh_project_cache(self):
+        """Test that a fresh project list answers without reading project files."""
+        self.manager.create_project("Test Project")
+        projects = self.manager.get_projects(force_refresh=True)
+
+        with patch("builtins.open") as mock_open:
+            self.assertEqual(self.manager.first_project_id(), projects[0]["id"])
+        mock_open.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
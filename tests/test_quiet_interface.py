@@ -0,0 +1,450 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the quiet interface server.
+
+Request handlers are created without a socket and write their responses
+to a buffer.
+"""
+
+import io
+import sys
+import gzip
+import json
+import shutil
+import tempfile
+import unittest
+from email.message import Message
+from pathlib import Path
+from unittest.mock import patch
+
+# Add project root and scripts directory to path
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+sys.path.insert(0, str(ROOT_DIR / "scripts"))
+
+import quiet_interface
+from quiet_interface import RequestHandler, _build_rag_context, _etag_matches, _REFERER_PROJECT_RE
+from rag_support.utils.project_manager import ProjectManager
+
+
+def make_handler(headers=None):
+    """Create a request handler that writes its response to a buffer."""
+    handler = RequestHandler.__new__(RequestHandler)
+    handler.headers = Message()
+    for name, value in (headers or {}).items():
+        handler.headers[name] = value
+    handler.wfile = io.BytesIO()
+    handler.request_version = "HTTP/1.1"
+    handler.requestline = "GET / HTTP/1.1"
+    handler.command = "GET"
+    handler.client_address = ("127.0.0.1", 0)
+    return handler
+
+
+def parse_response(handler):
+    """Return (status, headers, body) of the response a handler wrote."""
+    head, _, body = handler.wfile.getvalue().partition(b"\r\n\r\n")
+    status_line, *header_lines = head.decode("latin-1").split("\r\n")
+    headers = dict(line.split(": ", 1) for line in header_lines)
+    return int(status_line.split()[1]), headers, body
+
+
+class TestFindModels(unittest.TestCase):
+    """Tests for the find_models cache."""
+
+    def setUp(self):
+        """Set up test environment."""
+        self.temp_dir = Path(tempfile.mkdtemp())
+        self.models_dir = self.temp_dir / "LLM-MODELS"
+
+        patchers = [
+            patch.object(quiet_interface, "_models_root", return_value=self.models_dir),
+            patch.object(quiet_interface, "_scan_models", side_effect=self.scan),
+            patch.dict(quiet_interface._models_cache, {"directories": None, "stamp": None, "models": None}),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.scans = 0
+
+    def tearDown(self):
+        """Clean up test environment."""
+        shutil.rmtree(self.temp_dir)
+
+    def scan(self):
+        """Fake model scan listing the model files under the models root."""
+        self.scans += 1
+        return sorted(str(path.relative_to(self.temp_dir)) for path in self.models_dir.rglob("*.gguf"))
+
+    def add_model(self, *parts):
+        """Create a model file under the models root."""
+        path = self.models_dir.joinpath(*parts)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b"model")
+
+    def test_unchanged_directories_hit_cache(self):
+        """Test that an unchanged tree is scanned once."""
+        self.add_model("quantized", "gguf", "a.gguf")
+
+        first = quiet_interface.find_models()
+        second = quiet_interface.find_models()
+
+        self.assertIs(first, second)
+        self.assertEqual(self.scans, 1)
+
+    def test_missing_directory_hits_cache(self):
+        """Test that a missing models directory is a valid cache stamp."""
+        self.assertEqual(quiet_interface.find_models(), [])
+        self.assertEqual(quiet_interface.find_models(), [])
+        self.assertEqual(self.scans, 1)
+
+    def test_new_models_are_found(self):
+        """Test that models added at each scanned depth invalidate the cache."""
+        self.assertEqual(quiet_interface.find_models(), [])
+
+        self.add_model("quantized", "gguf", "a.gguf")
+        self.assertEqual(quiet_interface.find_models(), ["LLM-MODELS/quantized/gguf/a.gguf"])
+
+        self.add_model("open-source", "llama", "7b", "b.gguf")
+        self.assertEqual(len(quiet_interface.find_models()), 2)
+
+        self.add_model("open-source", "llama", "7b", "c.gguf")
+        self.assertEqual(len(quiet_interface.find_models()), 3)
+        self.assertEqual(self.scans, 4)
+
+
+class TestModelsRoot(unittest.TestCase):
+    """Tests for the models directory the cache stamps."""
+
+    def test_follows_inference_module(self):
+        """Test that the stamped root is the one the inference module scans."""
+        base_dir = Path(tempfile.gettempdir()) / "models-base"
+        with patch.object(quiet_interface.minimal_inference, "BASE_DIR", base_dir):
+            self.assertEqual(quiet_interface._models_root(), base_dir / "LLM-MODELS")
+
+    def test_without_inference_module(self):
+        """Test that the interface's own root is used without the module."""
+        with patch.object(quiet_interface, "minimal_inference", None):
+            self.assertEqual(quiet_interface._models_root(), quiet_interface.BASE_DIR / "LLM-MODELS")
+
+
+class TestEtagMatches(unittest.TestCase):
+    """Tests for If-None-Match comparison."""
+
+    def test_matches(self):
+        """Test the header values that match an ETag."""
+        for header in ['"abc"', 'W/"abc"', '"x", "abc"', '"x",W/"abc" ', '*']:
+            self.assertTrue(_etag_matches('"abc"', header), header)
+
+    def test_does_not_match(self):
+        """Test the header values that do not match an ETag."""
+        for header in [None, '', '"ab"', 'W/"xabc"', '"abc-2"', '"x", "y"']:
+            self.assertFalse(_etag_matches('"abc"', header), header)
+
+
+class TestSendEncoded(unittest.TestCase):
+    """Tests for gzip negotiation and revalidation of cached bodies."""
+
+    body = b"body " * 100
+    etag = '"etag-1"'
+
+    def send(self, headers, gzipped=True, etag=etag):
+        """Send the test body with the given request headers."""
+        handler = make_handler(headers)
+        handler._send_encoded(
+            "text/plain", self.body, gzip.compress(self.body) if gzipped else None, etag
+        )
+        return parse_response(handler)
+
+    def test_plain_body(self):
+        """Test that a client without gzip support gets the plain body."""
+        status, headers, body = self.send({})
+
+        self.assertEqual(status, 200)
+        self.assertEqual(body, self.body)
+        self.assertNotIn("Content-Encoding", headers)
+        self.assertEqual(headers["Vary"], "Accept-Encoding")
+        self.assertEqual(headers["ETag"], self.etag)
+
+    def test_gzip_body(self):
+        """Test that a client accepting gzip gets the compressed body."""
+        status, headers, body = self.send({"Accept-Encoding": "gzip, deflate"})
+
+        self.assertEqual(status, 200)
+        self.assertEqual(headers["Content-Encoding"], "gzip")
+        self.assertEqual(int(headers["Content-Length"]), len(body))
+        self.assertEqual(gzip.decompress(body), self.body)
+
+    def test_uncompressed_type(self):
+        """Test that a body without a gzip form is sent as is."""
+        status, headers, body = self.send({"Accept-Encoding": "gzip"}, gzipped=False)
+
+        self.assertEqual(body, self.body)
+        self.assertNotIn("Content-Encoding", headers)
+        self.assertNotIn("Vary", headers)
+
+    def test_not_modified(self):
+        """Test that a matching If-None-Match gets an empty 304."""
+        status, headers, body = self.send({"If-None-Match": f'"old", W/{self.etag}'})
+
+        self.assertEqual(status, 304)
+        self.assertEqual(body, b"")
+        self.assertEqual(headers["ETag"], self.etag)
+        self.assertEqual(headers["Vary"], "Accept-Encoding")
+        self.assertEqual(headers["Cache-Control"], "no-cache")
+
+    def test_stale_etag(self):
+        """Test that an ETag containing the current one is not a match."""
+        status, _, body = self.send({"If-None-Match": 'W/"xetag-1"'})
+
+        self.assertEqual(status, 200)
+        self.assertEqual(body, self.body)
+
+    def test_no_etag(self):
+        """Test that a body without an ETag is always sent."""
+        status, headers, _ = self.send({"If-None-Match": "*"}, etag=None)
+
+        self.assertEqual(status, 200)
+        self.assertNotIn("ETag", headers)
+
+
+class TestServeModels(unittest.TestCase):
+    """Tests for revalidation of the /api/models response."""
+
+    def setUp(self):
+        """Set up test environment."""
+        self.models = ["LLM-MODELS/quantized/gguf/a.gguf"]
+        patchers = [
+            patch.object(quiet_interface, "find_models", side_effect=lambda: self.models),
+            patch.object(quiet_interface, "_models_body", (None, None, None, None)),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def serve(self, headers=None):
+        """Serve /api/models with the given request headers."""
+        handler = make_handler(headers)
+        handler._serve_models("/api/models")
+        return parse_response(handler)
+
+    def test_models_list(self):
+        """Test that the models list is sent with an ETag."""
+        status, headers, body = self.serve()
+
+        self.assertEqual(status, 200)
+        self.assertEqual(json.loads(body), {"models": self.models})
+        self.assertIn("ETag", headers)
+
+    def test_not_modified(self):
+        """Test that a client holding the current list gets a 304."""
+        _, headers, _ = self.serve()
+
+        status, _, body = self.serve({"If-None-Match": headers["ETag"]})
+
+        self.assertEqual(status, 304)
+        self.assertEqual(body, b"")
+
+    def test_changed_models(self):
+        """Test that a changed models list is sent with a new ETag."""
+        _, headers, _ = self.serve()
+        self.models = self.models + ["LLM-MODELS/quantized/gguf/b.gguf"]
+
+        status, new_headers, body = self.serve({"If-None-Match": headers["ETag"]})
+
+        self.assertEqual(status, 200)
+        self.assertEqual(json.loads(body), {"models": self.models})
+        self.assertNotEqual(new_headers["ETag"], headers["ETag"])
+
+
+class TestRefererProject(unittest.TestCase):
+    """Tests for the Referer project ID pattern."""
+
+    def project_id(self, referer):
+        """Return the project ID the pattern finds in a Referer."""
+        match = _REFERER_PROJECT_RE.match(referer)
+        return match.group(1) if match else None
+
+    def test_project_ids(self):
+        """Test the project found in Referers that name one."""
+        referers = {
+            "http://localhost:5100/projects/abc123": "abc123",
+            "http://localhost:5100/projects/abc123/chat": "abc123",
+            "http://localhost:5100/projects/abc123?tab=docs": "abc123",
+            "http://localhost:5100/projects/abc123#top": "abc123",
+            "https://example.com/app/projects/86d8b6a7-c7b9-4eee-b885-656110db177b/":
+                "86d8b6a7-c7b9-4eee-b885-656110db177b",
+            "http://localhost:5100/projects/a/projects/b": "a",
+            "http://projects/projects/abc": "abc",
+            "http://user@projects:80/projects/abc": "abc",
+            "//localhost/projects/abc": "abc",
+            "/projects/abc": "abc",
+        }
+        for referer, project_id in referers.items():
+            self.assertEqual(self.project_id(referer), project_id, referer)
+
+    def test_no_project(self):
+        """Test Referers without a project in their path."""
+        referers = [
+            "http://projects/other/path",
+            "http://localhost:5100/?next=/projects/abc",
+            "http://localhost:5100/#/projects/abc",
+            "http://localhost:5100/projects/",
+            "http://localhost:5100/projects",
+            "http://localhost:5100/myprojects/abc",
+            "http://localhost:5100/projects-old/abc",
+            "http://localhost:5100/",
+            "",
+        ]
+        for referer in referers:
+            self.assertIsNone(self.project_id(referer), referer)
+
+
+class TestBuildRagContext(unittest.TestCase):
+    """Tests for RAG context assembly."""
+
+    def setUp(self):
+        """Set up test environment."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.manager = ProjectManager()
+        self.manager.projects_dir = Path(self.temp_dir)
+        self.project_id = self.manager.create_project("Test Project")
+
+    def tearDown(self):
+        """Clean up test environment."""
+        shutil.rmtree(self.temp_dir)
+
+    def add(self, content, title="Doc", tags=None):
+        """Add a document and return its ID."""
+        return self.manager.add_document(self.project_id, title, content, tags=tags)
+
+    def test_smallest_documents_first(self):
+        """Test that documents are added smallest first within the budget."""
+        large = self.add("l" * 2000, "Large")
+        small = self.add("s" * 400, "Small")
+        medium = self.add("m" * 1600, "Medium")
+
+        content, info, tokens = _build_rag_context(self.manager, self.project_id, [large, small, medium])
+
+        self.assertEqual([doc["id"] for doc in info], [small, medium])
+        self.assertEqual(tokens, 500)
+        self.assertEqual(content, f"## Small\n\n{'s' * 400}\n\n## Medium\n\n{'m' * 1600}\n\n")
+        self.assertFalse(any(doc["truncated"] for doc in info))
+
+    def test_first_document_truncated(self):
+        """Test that a first document over the budget is truncated to it."""
+        doc_id = self.add("x" * 5000, "Huge")
+
+        content, info, tokens = _build_rag_context(self.manager, self.project_id, [doc_id], max_context_tokens=100)
+
+        self.assertEqual(content, f"## Huge\n\n{'x' * 400}...[truncated]\n\n")
+        self.assertEqual(info, [{"id": doc_id, "title": "Huge", "tokens": 103, "truncated": True}])
+        self.assertEqual(tokens, 103)
+
+    def test_missing_documents_skipped(self):
+        """Test that unknown document IDs are ignored."""
+        doc_id = self.add("content")
+
+        _, info, _ = _build_rag_context(self.manager, self.project_id, ["missing", doc_id])
+
+        self.assertEqual([doc["id"] for doc in info], [doc_id])
+
+    def test_documents_past_budget_not_loaded(self):
+        """Test that documents after the first that does not fit are never loaded."""
+        small = self.add("s" * 400)
+        medium = self.add("m" * 4000)
+        large = self.add("l" * 8000)
+
+        with patch.object(self.manager, "_load_document", wraps=self.manager._load_document) as load:
+            _build_rag_context(self.manager, self.project_id, [large, medium, small])
+
+        self.assertEqual([call.args[1] for call in load.call_args_list], [small, medium])
+
+    def test_ordered_by_file_size(self):
+        """Test that documents are ordered by file size, frontmatter included."""
+        tagged = self.add("t" * 400, "Tagged", tags=["tag" * 50])
+        plain = self.add("p" * 420, "Plain")
+
+        _, info, _ = _build_rag_context(self.manager, self.project_id, [tagged, plain], max_context_tokens=150)
+
+        self.assertEqual(info, [{"id": plain, "title": "Plain", "tokens": 105, "truncated": False}])
+
+
+class DisconnectingFile(io.BytesIO):
+    """Response buffer whose client disconnects after the headers."""
+
+    def write(self, data):
+        if self.tell():
+            raise BrokenPipeError
+        return super().write(data)
+
+
+class TestStreamChat(unittest.TestCase):
+    """Tests for the Server-Sent Events chat stream."""
+
+    def setUp(self):
+        """Set up test environment."""
+        self.closed = False
+
+    def run_stream(self, handler, tokens):
+        """Stream a fake generation through handler."""
+        def generate_stream(model_path, **kwargs):
+            try:
+                for token in tokens:
+                    if isinstance(token, Exception):
+                        raise token
+                    yield token
+            finally:
+                self.closed = True
+
+        with patch.object(quiet_interface.minimal_inference, "generate_stream", side_effect=generate_stream):
+            handler._stream_chat("model.gguf", {"prompt": "Hi"}, ["doc"])
+
+    def stream(self, tokens):
+        """Stream a fake generation and return (headers, events)."""
+        handler = make_handler()
+        self.run_stream(handler, tokens)
+
+        status, headers, body = parse_response(handler)
+        self.assertEqual(status, 200)
+        self.assertTrue(body.endswith(b"\n\n"))
+        events = []
+        for frame in body[:-2].split(b"\n\n"):
+            self.assertTrue(frame.startswith(b"data: "), frame)
+            events.append(json.loads(frame[len(b"data: "):]))
+        return headers, events
+
+    def test_token_events(self):
+        """Test that each chunk is one event, followed by the stats."""
+        headers, events = self.stream(["Hel", "lo\n\nworld"])
+
+        self.assertEqual(headers["Content-type"], "text/event-stream")
+        self.assertEqual(headers["Connection"], "close")
+        self.assertEqual(events[:2], [{"token": "Hel"}, {"token": "lo\n\nworld"}])
+        self.assertTrue(events[2]["done"])
+        self.assertEqual(events[2]["tokens_generated"], 2)
+        self.assertEqual(events[2]["context_count"], 1)
+        self.assertEqual(len(events), 3)
+
+    def test_error_event(self):
+        """Test that a generation error ends the stream with an error event."""
+        _, events = self.stream(["Hel", RuntimeError("model failed")])
+
+        self.assertEqual(events[0], {"token": "Hel"})
+        self.assertEqual(events[1]["error"], "model failed")
+        self.assertEqual(events[1]["model"], "model.gguf")
+        self.assertEqual(len(events), 2)
+
+    def test_disconnect_closes_generation(self):
+        """Test that a client disconnect stops the generation while locked."""
+        handler = make_handler()
+        handler.wfile = DisconnectingFile()
+
+        self.run_stream(handler, ["Hel", "lo"] * 100)
+
+        self.assertTrue(self.closed)
+        self.assertFalse(quiet_interface.generation_lock.locked())
+
+
+if __name__ == "__main__":
+    unittest.main()